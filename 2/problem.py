@@ -37,18 +37,15 @@
 #             print(v)
 #             print(100*n + v)
 #             break
-from dataclasses import dataclass
-from typing import List
+import itertools
+import os
+import sys
+from typing import List, Tuple
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import Program, parallel_search, read_memory, run_program  # noqa: E402
 
-class EndProgram(Exception):
-    pass
-
-
-@dataclass
-class ProgramState:
-    memory: List[int]
-    instr_pointer: int
+EXPECTED_OUTPUT = 19690720
 
 
 def get_input():
@@ -56,63 +53,34 @@ def get_input():
         return f.read()
 
 
-def handle_1(prog_state: ProgramState):
-    arg1 = prog_state.memory[prog_state.instr_pointer + 1]
-    arg2 = prog_state.memory[prog_state.instr_pointer + 2]
-    target = prog_state.memory[prog_state.instr_pointer + 3]
-
-    prog_state.memory[target] = prog_state.memory[arg1] + prog_state.memory[arg2]
-    prog_state.instr_pointer += 4
-
-    return prog_state
-
-
-def handle_2(prog_state: ProgramState):
-    arg1 = prog_state.memory[prog_state.instr_pointer + 1]
-    arg2 = prog_state.memory[prog_state.instr_pointer + 2]
-    target = prog_state.memory[prog_state.instr_pointer + 3]
-
-    prog_state.memory[target] = prog_state.memory[arg1] * prog_state.memory[arg2]
-    prog_state.instr_pointer += 4
-
-    return prog_state
-
-
-def handle_3(prog_state: ProgramState):
-    return prog_state
-
-
-def handle_4(prog_state: ProgramState):
-    return prog_state
-
-
-def handle_99(prog_state: ProgramState):
-    raise EndProgram('Over')
-
-
-def execute_instr(prog_state: ProgramState):
-    opcode = prog_state.memory[prog_state.instr_pointer]
-    method_name = f'handle_{str(opcode)}'
-    method = globals()[method_name]
+def run_gravity_assist(memory: List[int], noun: int, verb: int) -> int:
+    memory[1] = noun
+    memory[2] = verb
+    # The gravity assist program predates the relative mode and the I/O instructions
+    program = Program(memory, 0, relative_mode=False, pause_on_input=False)
+    return run_program(program).memory[0]
 
-    prog_state = method(prog_state)
 
-    return prog_state
+def gravity_assist_score(memory: List[int], noun_verb: Tuple[int, int]) -> int:
+    """ How close the noun and verb get to the expected output """
+    return -abs(run_gravity_assist(memory, *noun_verb) - EXPECTED_OUTPUT)
 
 
-input = get_input()
-prog_state = ProgramState(
-    list(map(int, input.split(','))),
-    0
-)
+def find_noun_verb(memory: List[int]) -> Tuple[int, int]:
+    noun_verb, score = parallel_search(
+        memory, itertools.product(range(100), repeat=2), gravity_assist_score
+    )
+    # The closest noun and verb are only the answer when they give the expected output
+    if score != 0:
+        raise ValueError(f'No noun and verb give {EXPECTED_OUTPUT}, {noun_verb} is {-score} away')
+    return noun_verb
 
-prog_state.memory[1] = 12
-prog_state.memory[2] = 2
 
-try:
-    while True:
-        prog_state = execute_instr(prog_state)
-except EndProgram:
-    pass
+if __name__ == '__main__':
+    memory = read_memory(get_input().strip())
+    print(run_gravity_assist(list(memory), 12, 2))
 
-print(prog_state)
+    noun, verb = find_noun_verb(memory)
+    print(noun)
+    print(verb)
+    print(100 * noun + verb)
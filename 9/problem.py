@@ -1,80 +1,9 @@
-from dataclasses import dataclass
-from enum import Enum
 import os
+import sys
 from typing import List
 
-
-class EndProgram(Exception):
-    pass
-
-
-class ParamMode(Enum):
-    Position = 0
-    Value = 1
-    Relative = 2
-
-
-OPCODE_PARAM_COUNT = {
-    1: 3,
-    2: 3,
-    3: 1,
-    4: 1,
-    5: 2,
-    6: 2,
-    7: 3,
-    8: 3,
-    9: 1,
-    99: 0,
-}
-
-
-@dataclass
-class Program:
-    memory: List[int]
-    instr_pointer: int
-    instr_pointer_modified: bool = False
-    relative_base: int = 0
-
-    def set_instr_pointer(self, value: int) -> 'Program':
-        self.instr_pointer = value
-        self.instr_pointer_modified = True
-        return self
-
-    def set_memory(self, pos: int, value: int) -> 'Program':
-        if pos >= len(self.memory):
-            self.memory.extend([0] * (pos - len(self.memory) + 1))
-
-        self.memory[pos] = value
-        return self
-
-    def get_memory(self, pos: int) -> int:
-        if pos >= len(self.memory):
-            return 0
-        else:
-            return self.memory[pos]
-
-    def move_instr_pointer(self, instr_params_count: int) -> 'Program':
-        if self.instr_pointer_modified:
-            self.instr_pointer_modified = False
-        else:
-            self.instr_pointer += instr_params_count
-
-        return self
-
-
-@dataclass
-class Param:
-    value: int
-    mode: ParamMode
-
-
-@dataclass
-class Instruction:
-    opcode: int
-    parameter_modes: List[ParamMode]
-
-    def __len__(self):
-        return 1 + len(self.parameter_modes)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import Program, read_memory, run_program  # noqa: E402
 
 
 def get_input():
@@ -82,181 +11,15 @@ def get_input():
         return f.read()
 
 
-def read_instr(int_instr: int) -> Instruction:
-    param_modes = list(map(lambda x: ParamMode(int(x)), str(int_instr)[:-2]))
-    param_modes.reverse()
-    return Instruction(
-        int(str(int_instr)[-2:]),
-        param_modes
-    )
-
-
-def get_params(program: Program, opcode: int, param_modes: List[ParamMode]) -> List[Param]:
-    params = []
-    for idx in range(OPCODE_PARAM_COUNT[opcode]):
-        if idx >= len(param_modes):
-            mode = ParamMode.Position
-        else:
-            mode = param_modes[idx]
-
-        params.append(
-            Param(
-                program.get_memory(program.instr_pointer + idx + 1),
-                mode
-            )
-        )
-
-    return params
-
-
-def param_value(program: Program, param: Param, as_position: bool = False) -> int:
-    if param.mode == ParamMode.Value:
-        return param.value
-    elif param.mode == ParamMode.Position:
-        if as_position:
-            return param.value
-        else:
-            return program.get_memory(param.value)
-    elif param.mode == ParamMode.Relative:
-        if as_position:
-            return program.relative_base + param.value
-        else:
-            return program.get_memory(program.relative_base + param.value)
-
-
-def handle_operation(program: Program) -> Program:
-    int_instr = program.get_memory(program.instr_pointer)
-    instr = read_instr(int_instr)
-
-    params = get_params(program, instr.opcode, instr.parameter_modes)
-
-    method_name = f'handle_{str(instr.opcode)}'
-    method = globals()[method_name]
-    if os.environ.get('DEBUG'):
-        print('-------')
-        print(f'Calling {method_name}')
-        print(f'with params: {params} of value {[param_value(program, param) for param in params]}')
-        print(f'with instr_pointer: {program.instr_pointer}')
-        print(f'with relative_base: {program.relative_base}')
-        print(f'with memory: {program.memory}')
-    program = method(program, params)
-    if os.environ.get('DEBUG'):
-        print('#######')
-        print(f'outputs memory: {program.memory}')
-        print(f'with relative_base: {program.relative_base}')
-
-    # Move program to next instruction
-    program.move_instr_pointer(OPCODE_PARAM_COUNT[instr.opcode] + 1)
-
-    return program
-
-def handle_1(program: Program, params: List[int]):
-    if os.environ.get('DEBUG'):
-        print('Summing')
-        print(f'  {param_value(program, params[0])}')
-        print(f'  {param_value(program, params[1])}')
-        print(f'  and storing at {params[2].value}')
-    program.set_memory(
-        param_value(program, params[2], as_position=True),
-        param_value(program, params[0]) + param_value(program, params[1])
-    )
-
-    return program
-
-
-def handle_2(program: Program, params: List[int]):
-    if os.environ.get('MULTIPLYING'):
-        print('Summing')
-        print(f'  {param_value(program, params[0])}')
-        print(f'  {param_value(program, params[1])}')
-        print(f'  and storing at {program.get_memory(params[2].value)}')
-    program.set_memory(
-        param_value(program, params[2], as_position=True),
-        param_value(program, params[0]) * param_value(program, params[1])
-    )
-
-    return program
-
-
-def handle_3(program: Program, params: List[int]):
-    program.set_memory(
-        param_value(program, params[0], as_position=True),
-        int(input("Program input: "))
-    )
-
-    return program
-
-
-def handle_4(program: Program, params: List[int]):
-    print(param_value(program, params[0]))
-
-    return program
-
-
-def handle_5(program: Program, params: List[int]):
-    param1 = param_value(program, params[0])
-    param2 = param_value(program, params[1])
-    if param1 != 0:
-        program.set_instr_pointer(param2)
-
-    return program
-
-
-def handle_6(program: Program, params: List[int]):
-    param1 = param_value(program, params[0])
-    param2 = param_value(program, params[1])
-    if param1 == 0:
-        program.set_instr_pointer(param2)
-
-    return program
-
-
-def handle_7(program: Program, params: List[int]):
-    param1 = param_value(program, params[0])
-    param2 = param_value(program, params[1])
-    pos = param_value(program, params[2], as_position=True)
-    if param1 < param2:
-        program.set_memory(pos, 1)
-    else:
-        program.set_memory(pos, 0)
-
-    return program
-
-
-def handle_8(program: Program, params: List[int]):
-    param1 = param_value(program, params[0])
-    param2 = param_value(program, params[1])
-    pos = param_value(program, params[2], as_position=True)
-    if param1 == param2:
-        program.set_memory(pos, 1)
-    else:
-        program.set_memory(pos, 0)
-
-    return program
-
-
-def handle_9(program: Program, params: List[int]):
-    param = param_value(program, params[0])
-    program.relative_base += param
-    return program
-
-
-def handle_99(program: Program, params: List[int]):
-    raise EndProgram('Over')
+def run_boost(memory: List[int], mode: int) -> List[int]:
+    program = Program(memory, 0, pause_on_input=False).feed([mode])
+    return run_program(program).outputs
 
 
 if __name__ == '__main__':
     input_str = get_input()
     # input_str = "109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99"
-    program = Program(
-        list(map(int, input_str.split(','))),
-        0
-    )
+    memory = read_memory(input_str.strip())
 
-    try:
-        if os.environ.get('IPDB'):
-            import ipdb; ipdb.set_trace()
-        while True:
-            program = handle_operation(program)
-    except EndProgram:
-        pass
+    for value in run_boost(memory, int(input("Program input: "))):
+        print(value)
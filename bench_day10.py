@@ -0,0 +1,64 @@
+from day10 import (
+    asteroid_positions, build_relative_maps, find_best_spot, find_best_station,
+    find_best_station_numpy, np, str_to_map, vaporization_order,
+)
+from input_utils import get_input
+import random
+import time
+from typing import List
+
+# Past this size, building an AsteroidMap per asteroid takes too long to be worth running
+RELATIVE_MAPS_MAX_SIZE = 40
+# Past this count, counting the directions of every pair in pure Python takes minutes
+SWEEP_MAX_ASTEROIDS = 12000
+
+
+def random_field(size: int, density: float, seed: int = 0) -> List[List[str]]:
+    """ Square asteroid field, each cell holding an asteroid with the given probability """
+    rng = random.Random(seed)
+    return [['#' if rng.random() < density else '.' for _ in range(size)] for _ in range(size)]
+
+
+def relative_maps_engine(asteroid_map: List[List[str]]):
+    best_vis, best_pos, best_map = find_best_spot(build_relative_maps(asteroid_map))
+    return best_vis, best_pos
+
+
+def sweep_engine(asteroid_map: List[List[str]]):
+    asteroids = asteroid_positions(asteroid_map)
+    best_vis, best_pos = find_best_station(asteroids)
+    vaporization_order(best_pos, asteroids)
+    return best_vis, best_pos
+
+
+def numpy_engine(asteroid_map: List[List[str]]):
+    asteroids = asteroid_positions(asteroid_map)
+    best_vis, best_pos = find_best_station_numpy(asteroids)
+    vaporization_order(best_pos, asteroids)
+    return best_vis, best_pos
+
+
+def bench(name: str, asteroid_map: List[List[str]]) -> None:
+    count = len(asteroid_positions(asteroid_map))
+    engines = []
+    if len(asteroid_map) <= RELATIVE_MAPS_MAX_SIZE:
+        engines.append(relative_maps_engine)
+    if count <= SWEEP_MAX_ASTEROIDS:
+        engines.append(sweep_engine)
+    if np is not None:
+        engines.append(numpy_engine)
+    for engine in engines:
+        start = time.perf_counter()
+        best_vis, best_pos = engine(asteroid_map)
+        elapsed = time.perf_counter() - start
+        print(
+            f'{name:<20} {count:>6} asteroids {engine.__name__:<22} '
+            f'{best_vis:>6} seen from ({best_pos.x}, {best_pos.y}) in {elapsed:8.3f}s'
+        )
+
+
+if __name__ == '__main__':
+    bench('day 10 input', str_to_map(get_input('10').strip('\n')))
+    for size in [20, 40, 80, 160, 320]:
+        for density in [0.1, 0.3, 0.6]:
+            bench(f'{size}x{size} at {density:.0%}', random_field(size, density))
@@ -0,0 +1,296 @@
+import day15
+from input_utils import get_input
+from intcode import (
+    PAGE_BITS, EndProgram, Profiler, Program, ProgramStatus, handle_operation, load_memory,
+    map_image, parallel_search, read_image, read_memory, run_profiled, run_program,
+    run_until_input
+)
+import importlib
+import itertools
+import time
+import tracemalloc
+from typing import Any, Callable, Iterator, List
+
+# The early days solutions, living in their own folders
+day_2 = importlib.import_module('2.problem')
+day_5 = importlib.import_module('5.problem')
+day_7 = importlib.import_module('7.problem')
+day_9 = importlib.import_module('9.problem')
+
+
+def fixed_inputs(values: List[int]) -> Callable[[Program, int], Program]:
+    values = list(values)
+
+    def input_function(program: Program, position: int) -> Program:
+        return program.set_memory(position, values.pop(0))
+
+    return input_function
+
+
+def ignore_output(program: Program, value: int) -> Program:
+    return program
+
+
+def count_instructions(program: Program) -> int:
+    if program.status == ProgramStatus.WAITING_INPUT:
+        program.status = ProgramStatus.RUNNING
+
+    count = 0
+    try:
+        while program.status == ProgramStatus.RUNNING:
+            program = handle_operation(program)
+            count += 1
+    except EndProgram:
+        count += 1
+
+    return count
+
+
+def boost_programs() -> Iterator[Program]:
+    yield Program(read_memory(get_input('9')), 0, fixed_inputs([2]), ignore_output)
+
+
+def breakout_programs() -> Iterator[Program]:
+    """ Day 13 game, the joystick following the ball """
+    memory = read_memory(get_input('13'))
+    memory[0] = 2
+    state = {'ball': 0, 'paddle': 0, 'pending': []}
+
+    def joystick(program: Program, position: int) -> Program:
+        direction = (state['ball'] > state['paddle']) - (state['ball'] < state['paddle'])
+        return program.set_memory(position, direction)
+
+    def screen(program: Program, value: int) -> Program:
+        state['pending'].append(value)
+        if len(state['pending']) == 3:
+            x, _, tile = state['pending']
+            if tile == 3:
+                state['paddle'] = x
+            elif tile == 4:
+                state['ball'] = x
+            state['pending'] = []
+        return program
+
+    yield Program(memory, 0, joystick, screen)
+
+
+def maze_programs() -> Iterator[Program]:
+    """ Day 15 repair droid, exploring the whole area """
+    area = day15.Area()
+    yield Program(
+        read_memory(get_input('15')), 0, day15.send_instruction(area), day15.update_area_map(area)
+    )
+
+
+def drone_programs() -> Iterator[Program]:
+    memory = read_memory(get_input('19'))
+    for y in range(50):
+        for x in range(50):
+            yield Program(list(memory), 0, fixed_inputs([x, y]), ignore_output)
+
+
+def forked_drone_programs() -> Iterator[Program]:
+    """ Day 19 probes forked from a program paused on its first input """
+    coordinates = []
+
+    def send_coordinates(program: Program, position: int) -> Program:
+        return program.set_memory(position, coordinates.pop(0))
+
+    waiting_program = run_until_input(
+        Program(read_memory(get_input('19')), 0, send_coordinates, ignore_output)
+    )
+    for y in range(50):
+        for x in range(50):
+            coordinates[:] = [x, y]
+            yield waiting_program.fork()
+
+
+def bench(name: str, programs: Callable[[], Iterator[Program]]) -> None:
+    instructions = sum(count_instructions(program) for program in programs())
+
+    for mode in ['interpreted', 'fused', 'compiled']:
+        start = time.perf_counter()
+        for program in programs():
+            program.fused = mode == 'fused'
+            program.compiled = mode == 'compiled'
+            run_program(program)
+        elapsed = time.perf_counter() - start
+
+        print(
+            f'{name:<16} {mode:<12} '
+            f'{instructions:>10} instructions in {elapsed:7.3f}s: '
+            f'{instructions / elapsed:>12,.0f} instructions/s'
+        )
+
+
+def bench_fusion(name: str, programs: Callable[[], Iterator[Program]]) -> None:
+    """ Share of the instructions run as part of a superinstruction """
+    instructions = 0
+    fused_instructions = 0
+    for fused_program, profiled_program in zip(programs(), programs()):
+        fused_program.fused = True
+        run_program(fused_program)
+        superinstructions = fused_program._fused.superinstructions
+
+        profiled_program.profiler = Profiler()
+        try:
+            run_profiled(profiled_program)
+        except EndProgram:
+            pass
+        counts = profiled_program.profiler.address_counts
+        instructions += profiled_program.profiler.instructions
+        fused_instructions += 2 * sum(counts[address] for address in superinstructions)
+
+    print(
+        f'{name:<16} {fused_instructions:>10} of {instructions:>10} instructions fused: '
+        f'{fused_instructions / instructions:6.1%}'
+    )
+
+
+def far_write_program() -> Program:
+    """ Writes and reads back a value a billion cells away, through the relative base """
+    return Program([109, 10 ** 9, 21101, 7, 0, 0, 204, 0, 99], 0, None, ignore_output)
+
+
+def bench_memory(name: str, program: Program) -> None:
+    tracemalloc.start()
+    run_program(program)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    highest_address = max(
+        [len(program.memory)] + [(page + 1) << PAGE_BITS for page in program._pages]
+    )
+    print(
+        f'{name:<16} peak {peak / 1024:>10,.1f} KiB: {len(program.memory)} cells in the list, '
+        f'{len(program._pages)} pages, a flat list would hold {highest_address:,} cells'
+    )
+
+
+def bench_search(name: str, memory: List[int], candidates: List, score: Callable) -> None:
+    start = time.perf_counter()
+    best = max(candidates, key=lambda candidate: score(list(memory), candidate))
+    serial = time.perf_counter() - start
+    print(f'{name:<16} serial       {serial:7.3f}s: best {best}')
+
+    for workers in [1, 2, 4]:
+        start = time.perf_counter()
+        best, _ = parallel_search(memory, candidates, score, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        print(
+            f'{name:<16} {workers} worker(s) {elapsed:7.3f}s: best {best}, '
+            f'{serial / elapsed:4.2f}x the serial search'
+        )
+
+
+def bench_loading(folder: str, repeat: int = 1000) -> None:
+    """ Loading a program memory from its text input, and from its binary image """
+    load_memory(folder)
+    loaders = {
+        'text': lambda: read_memory(get_input(folder)),
+        'image': lambda: read_image(f'{folder}/input.img'),
+        'mapped image': lambda: list(map_image(f'{folder}/input.img')),
+    }
+    for name, loader in loaders.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            memory = loader()
+        elapsed = time.perf_counter() - start
+        print(
+            f'day {folder:<12} {name:<12} {len(memory):>6} cells: '
+            f'{elapsed / repeat * 1e6:8.1f}us per load'
+        )
+
+
+def bench_maze_exploration() -> None:
+    """ Day 15 area mapped by a single droid walking around, or by a droid forked per branch """
+    memory = read_memory(get_input('15'))
+    for mode in ['walk', 'walk compiled', 'forks']:
+        instructions = 0
+
+        def counting_run(program: Program) -> Program:
+            nonlocal instructions
+            instructions += count_instructions(program)
+            # The input instruction a program pauses on runs again once it is resumed
+            if program.status == ProgramStatus.WAITING_INPUT:
+                instructions -= 1
+            return program
+
+        for run in [counting_run, run_program]:
+            area = day15.Area()
+            start = time.perf_counter()
+            if mode == 'forks':
+                droid = run(Program(list(memory), 0))
+                droids = day15.explore_with_forks(area, droid, run)
+            else:
+                droids = 1
+                run(Program(
+                    list(memory), 0, day15.send_instruction(area), day15.update_area_map(area),
+                    compiled=mode == 'walk compiled'
+                ))
+            elapsed = time.perf_counter() - start
+
+        print(
+            f'day 15 mapping  {mode:<14} {droids:>4} droids '
+            f'{instructions:>10} instructions in {elapsed:7.3f}s'
+        )
+
+
+def regression(name: str, solve: Callable[[], Any], expected: Any) -> None:
+    start = time.perf_counter()
+    answer = solve()
+    elapsed = time.perf_counter() - start
+    status = 'ok' if answer == expected else f'FAILED, expected {expected}'
+    print(f'{name:<16} {elapsed:7.3f}s: {answer} {status}')
+
+
+def bench_days() -> None:
+    """ Runs the days 2, 5, 7 and 9 solutions, all on the intcode engine, against their answers """
+    memory = read_memory(get_input('2'))
+    regression('day 2 part 1', lambda: day_2.run_gravity_assist(list(memory), 12, 2), 2894520)
+    regression('day 2 part 2', lambda: day_2.find_noun_verb(memory), (93, 42))
+
+    memory = read_memory(get_input('5'))
+    regression('day 5 part 1', lambda: day_5.run_diagnostic(list(memory), 1)[-1], 15259545)
+    regression('day 5 part 2', lambda: day_5.run_diagnostic(list(memory), 5), [7616021])
+
+    memory = read_memory(get_input('7'))
+    regression('day 7 part 2', lambda: day_7.find_output_signal(memory), ((6, 5, 9, 8, 7), 4248984))
+
+    memory = read_memory(get_input('9'))
+    regression('day 9 part 1', lambda: day_9.run_boost(list(memory), 1), [3598076521])
+    regression('day 9 part 2', lambda: day_9.run_boost(list(memory), 2), [90722])
+
+
+if __name__ == '__main__':
+    bench('day 9 BOOST', boost_programs)
+    bench('day 13 breakout', breakout_programs)
+    bench('day 15 maze', maze_programs)
+    bench('day 19 drone', drone_programs)
+    bench('day 19 forked', forked_drone_programs)
+
+    bench_fusion('day 9 BOOST', boost_programs)
+    bench_fusion('day 13 breakout', breakout_programs)
+    bench_fusion('day 15 maze', maze_programs)
+    bench_fusion('day 19 drone', drone_programs)
+
+    bench_memory(
+        'day 9 self-test',
+        Program(read_memory(get_input('9')), 0, fixed_inputs([1]), ignore_output)
+    )
+    bench_memory('day 9 BOOST', next(boost_programs()))
+    bench_memory('far write', far_write_program())
+
+    bench_search(
+        'day 2 noun/verb',
+        read_memory(get_input('2')),
+        list(itertools.product(range(100), repeat=2)),
+        day_2.gravity_assist_score
+    )
+
+    bench_days()
+
+    bench_maze_exploration()
+
+    for folder in ['9', '13', '19']:
+        bench_loading(folder)
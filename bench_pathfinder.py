@@ -0,0 +1,289 @@
+import day15
+from input_utils import get_input
+from intcode import Program, load_memory, run_program
+from pathfinder import (
+    ChunkedGrid, FrontierExplorer, Grid, Position, SearchStats, SearchStrategy, closest_tile,
+    distance_matrix, neighbors, shortest_path, tile_content,
+)
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Past this size, the list queue search takes too long to be worth running
+LIST_QUEUE_MAX_SIZE = 100
+# Past this size, the searches on lists of lists take too long to be worth running
+LIST_MAP_MAX_SIZE = 500
+# Past this size, exploring with a closest_tile search per target takes too long
+CLOSEST_TILE_EXPLORATION_MAX_SIZE = 501
+# Cell value of the explored maps that are not known yet
+UNKNOWN = 0
+
+
+def list_queue_closest_tile(
+    tile_map: List[List[T]], from_position: Position, tile_value: T,
+    unauthorized_tile_values: Optional[Set[T]] = None
+) -> Optional[Tuple[Position, List[Position]]]:
+    """ closest_tile as it was, popping from the head of a list, and copying paths and sets """
+    if unauthorized_tile_values is None:
+        unauthorized_tile_values = set()
+
+    next_to_try = [(from_position, [])]
+    seen = set([from_position])
+    while True:
+        tile_pos, cur_path = next_to_try.pop(0)
+        next_tiles = [
+            tile for tile in neighbors(tile_pos)
+            if tile_content(tile_map, tile) not in unauthorized_tile_values
+        ]
+        next_to_try.extend(
+            list(map(
+                lambda x: (x, cur_path + [x]),
+                [tile for tile in next_tiles if tile not in seen]
+            ))
+        )
+        seen = seen | set(next_tiles)
+        if tile_content(tile_map, tile_pos) == tile_value:
+            return (tile_pos, cur_path)
+
+        if not next_to_try:
+            return None
+
+
+def random_map(size: int, wall_ratio: float, seed: int = 0) -> List[List[str]]:
+    """ Square map surrounded by walls, with a target in the corner opposite to (1, 1) """
+    rng = random.Random(seed)
+    tile_map = [
+        [
+            '#' if x in (0, size - 1) or y in (0, size - 1) or rng.random() < wall_ratio else '.'
+            for x in range(size)
+        ]
+        for y in range(size)
+    ]
+    tile_map[1][1] = '.'
+    tile_map[size - 2][size - 2] = 'X'
+    return tile_map
+
+
+def maze_map(size: int, seed: int = 0) -> List[List[str]]:
+    """ Square maze with a single path between any two corridors, dug from (1, 1) """
+    rng = random.Random(seed)
+    tile_map = [['#' for _ in range(size)] for _ in range(size)]
+    tile_map[1][1] = '.'
+    stack = [Position(1, 1)]
+    while stack:
+        position = stack[-1]
+        next_cells = [
+            Position(position.x + dx, position.y + dy)
+            for dx, dy in [(0, 2), (2, 0), (0, -2), (-2, 0)]
+            if 0 < position.x + dx < size - 1 and 0 < position.y + dy < size - 1 and
+            tile_map[position.y + dy][position.x + dx] == '#'
+        ]
+        if not next_cells:
+            stack.pop()
+            continue
+
+        cell = rng.choice(next_cells)
+        tile_map[(position.y + cell.y) // 2][(position.x + cell.x) // 2] = '.'
+        tile_map[cell.y][cell.x] = '.'
+        stack.append(cell)
+
+    return tile_map
+
+
+def maze_area() -> day15.Area:
+    """ Day 15 area, once entirely explored by the repair droid """
+    area = day15.Area()
+    run_program(
+        Program(load_memory('15'), 0, day15.send_instruction(area), day15.update_area_map(area))
+    )
+    return area
+
+
+def bench(name: str, search, tile_map, from_position, tile_value, unauthorized) -> None:
+    start = time.perf_counter()
+    found = search(tile_map, from_position, tile_value, unauthorized)
+    elapsed = time.perf_counter() - start
+
+    length = len(found[1]) if found else None
+    if isinstance(tile_map, Grid):
+        size = f'{tile_map.width}x{tile_map.height}'
+        name += ' (grid)'
+    elif isinstance(tile_map, ChunkedGrid):
+        width = tile_map.bottom_right.x - tile_map.top_left.x + 1
+        height = tile_map.bottom_right.y - tile_map.top_left.y + 1
+        size = f'{width}x{height}'
+        name += ' (chunked)'
+    else:
+        size = f'{len(tile_map[0])}x{len(tile_map)}'
+    print(f'{name:<22} {size:>9} {search.__name__:<24} path {length!s:>5} in {elapsed:8.3f}s')
+
+
+def bench_strategies(name: str, tile_map, from_position, to_position, unauthorized) -> None:
+    if isinstance(tile_map, Grid):
+        size = f'{tile_map.width}x{tile_map.height}'
+        name += ' (grid)'
+    else:
+        size = f'{len(tile_map[0])}x{len(tile_map)}'
+
+    for strategy in SearchStrategy:
+        stats = SearchStats()
+        start = time.perf_counter()
+        path = shortest_path(
+            tile_map, from_position, to_position, unauthorized_tile_values=unauthorized,
+            strategy=strategy, stats=stats
+        )
+        elapsed = time.perf_counter() - start
+
+        length = len(path) if path is not None else None
+        print(
+            f'{name:<22} {size:>9} {strategy.value:<14} path {length!s:>7} '
+            f'expanded {stats.expanded:>8} in {elapsed:8.3f}s'
+        )
+
+
+def labyrinth_points() -> Tuple[List[List[str]], Dict[str, Position], Dict[Position, int]]:
+    """ Day 18 labyrinth, with its entrance and keys as points, and its doors as gates """
+    tile_map = [list(line) for line in get_input('18').strip('\n').split('\n')]
+    points = {}
+    doors = {}
+    for y, line in enumerate(tile_map):
+        for x, tile in enumerate(line):
+            if tile == '@' or tile.islower():
+                points[tile] = Position(x, y)
+            elif tile.isupper():
+                doors[Position(x, y)] = 1 << (ord(tile) - ord('A'))
+
+    return tile_map, points, doors
+
+
+def pairwise_distances(tile_map, points: Dict[str, Position], unauthorized) -> int:
+    """ What a distance matrix costs with one shortest_path per pair of points """
+    reachable = 0
+    for source in points.values():
+        for target in points.values():
+            if shortest_path(tile_map, source, target, unauthorized_tile_values=unauthorized):
+                reachable += 1
+    return reachable
+
+
+def bench_distance_matrix() -> None:
+    tile_map, points, doors = labyrinth_points()
+    grid = Grid.from_rows(tile_map, encode=ord)
+    for name, function, args in [
+        ('pairwise', pairwise_distances, (tile_map, points, {'#'})),
+        ('pairwise (grid)', pairwise_distances, (grid, points, {ord('#')})),
+        ('matrix', distance_matrix, (tile_map, points, None, {'#'}, doors)),
+        ('matrix (grid)', distance_matrix, (grid, points, None, {ord('#')}, doors)),
+    ]:
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        print(f'day 18 {len(points)} points {name:<16} in {elapsed:8.3f}s')
+
+
+def explore_with_closest_tile(tile_map: List[List[str]], start: Position) -> int:
+    """ Moves to map tile_map from start, as day 15 did, with a closest_tile search per target """
+    known = Grid(len(tile_map[0]), len(tile_map), fill=UNKNOWN)
+    known[start] = ord(tile_map[start.y][start.x])
+    position = start
+    path = []
+    moves = 0
+    while True:
+        if not path:
+            closest = closest_tile(known, position, UNKNOWN, {ord('#')})
+            if closest is None:
+                return moves
+            path = closest[1][::-1]
+
+        next_position = path.pop()
+        moves += 1
+        known[next_position] = ord(tile_map[next_position.y][next_position.x])
+        if tile_map[next_position.y][next_position.x] != '#':
+            position = next_position
+
+
+def explore_with_frontier_explorer(tile_map: List[List[str]], start: Position) -> int:
+    """ Moves to map tile_map from start, following a FrontierExplorer """
+    known = Grid(len(tile_map[0]), len(tile_map), fill=UNKNOWN)
+    known[start] = ord(tile_map[start.y][start.x])
+    explorer = FrontierExplorer(known, UNKNOWN, {ord('#')}, start)
+    moves = 0
+    while True:
+        next_position = explorer.next_step()
+        if next_position is None:
+            return moves
+
+        moves += 1
+        explorer.reveal(next_position, ord(tile_map[next_position.y][next_position.x]))
+
+
+def bench_exploration() -> None:
+    for size in [51, 101, 201, 501, 1001]:
+        for name, tile_map in [
+            ('maze', maze_map(size)),
+            ('random walls', random_map(size, 0.3)),
+            ('open map', random_map(size, 0.0)),
+        ]:
+            explorations = [explore_with_frontier_explorer]
+            if size <= CLOSEST_TILE_EXPLORATION_MAX_SIZE:
+                explorations.insert(0, explore_with_closest_tile)
+            for explore in explorations:
+                start = time.perf_counter()
+                moves = explore(tile_map, Position(1, 1))
+                elapsed = time.perf_counter() - start
+                print(
+                    f'exploring {name:<13} {size:>4}x{size:<4} {explore.__name__:<30} '
+                    f'{moves:>8} moves in {elapsed:8.3f}s'
+                )
+
+
+if __name__ == '__main__':
+    bench_exploration()
+    print()
+    bench_distance_matrix()
+    print()
+
+    area = maze_area()
+    start = Position(day15.ROBOT_START, day15.ROBOT_START)
+    # The rows start from the top left corner of the area
+    rows_start = Position(start.x - area.tiles.top_left.x, start.y - area.tiles.top_left.y)
+    area_rows = [[day15.Tile(value) for value in row] for row in area.tiles.rows()]
+    unauthorized = {day15.Tile.WALL, day15.Tile.UNEXPLORED}
+    for search in [list_queue_closest_tile, closest_tile]:
+        bench('day 15 area', search, area_rows, rows_start, day15.Tile.OXYGEN, unauthorized)
+    area_grid = Grid.from_rows(area.tiles.rows(), outside=day15.Tile.OUT.value)
+    bench(
+        'day 15 area', closest_tile, area_grid, rows_start, day15.Tile.OXYGEN.value,
+        day15.MAPPED_BLOCKING_TILES
+    )
+    bench(
+        'day 15 area', closest_tile, area.tiles, start, day15.Tile.OXYGEN.value,
+        day15.MAPPED_BLOCKING_TILES
+    )
+
+    for size in [50, 100, 200, 500, 1000, 2000]:
+        for name, wall_ratio in [('open map', 0.0), ('random walls', 0.3)]:
+            tile_map = random_map(size, wall_ratio)
+            searches = [closest_tile]
+            if size <= LIST_QUEUE_MAX_SIZE:
+                searches.insert(0, list_queue_closest_tile)
+            for search in searches:
+                bench(name, search, tile_map, Position(1, 1), 'X', {'#'})
+            grid = Grid.from_rows(tile_map, encode=ord)
+            bench(name, closest_tile, grid, Position(1, 1), ord('X'), {ord('#')})
+
+    print()
+    for size in [101, 501, 1001, 2001]:
+        corner = Position(size - 2, size - 2)
+        for name, tile_map in [
+            ('open map', random_map(size, 0.0)),
+            ('random walls', random_map(size, 0.3)),
+            ('maze', maze_map(size)),
+        ]:
+            tile_map[corner.y][corner.x] = '.'
+            if size <= LIST_MAP_MAX_SIZE:
+                bench_strategies(name, tile_map, Position(1, 1), corner, {'#'})
+            grid = Grid.from_rows(tile_map, encode=ord)
+            bench_strategies(name, grid, Position(1, 1), corner, {ord('#')})
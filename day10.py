@@ -1,11 +1,22 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from functools import total_ordering
+from functools import cmp_to_key, total_ordering
 from input_utils import get_input
 from math import gcd
 import os
 from pathfinder import Position
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Pairs of asteroids compared at once by the numpy backend, bounding the memory of a block
+NUMPY_BLOCK_PAIRS = 1 << 21
+
+# Direction from a station to an asteroid, (dx, dy) divided by their gcd
+Direction = Tuple[int, int]
 
 
 class Hemisphere(Enum):
@@ -177,6 +188,146 @@ def find_best_spot(maps: Dict[Position, AsteroidMap]) -> Tuple[int, Position, As
     return best_vis, best_pos, best_map
 
 
+def asteroid_positions(absolute_map: List[List[str]]) -> List[Position]:
+    return [
+        Position(x, y)
+        for y, line in enumerate(absolute_map)
+        for x, elem in enumerate(line)
+        if elem == '#'
+    ]
+
+
+def direction(from_pos: Position, to_pos: Position) -> Direction:
+    dx = to_pos.x - from_pos.x
+    dy = to_pos.y - from_pos.y
+    reduction = gcd(dx, dy)
+    return dx // reduction, dy // reduction
+
+
+@dataclass
+class DirectionTable:
+    """
+    Reduced direction of every step between two cells of a width x height map, as an int code
+    looked up by the difference of the cell codes, so no gcd is computed per pair of asteroids
+    """
+    width: int
+    height: int
+    # Wide enough for the difference of two codes to tell the step dx apart from dy
+    stride: int = field(init=False)
+    offset: int = field(init=False)
+    directions: List[Optional[int]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.stride = 2 * self.width
+        self.offset = (self.height - 1) * self.stride + self.width - 1
+        self.directions = [None] * ((2 * self.height - 1) * self.stride)
+        for dy in range(1 - self.height, self.height):
+            for dx in range(1 - self.width, self.width):
+                reduction = gcd(dx, dy)
+                if reduction:
+                    self.directions[self.offset + dy * self.stride + dx] = (
+                        dy // reduction * self.stride + dx // reduction
+                    )
+
+    def code(self, position: Position) -> int:
+        return position.y * self.stride + position.x
+
+    def visible_count(self, station: int, asteroids: List[int]) -> int:
+        """ Asteroids seen from the station code, the closest on a direction hiding the others """
+        shift = self.offset - station
+        directions = set(map(self.directions.__getitem__, map(shift.__add__, asteroids)))
+        # The station itself is the None direction
+        return len(directions) - (None in directions)
+
+
+def find_best_station(asteroids: List[Position]) -> Tuple[int, Optional[Position]]:
+    if not asteroids:
+        return 0, None
+
+    table = DirectionTable(
+        max(asteroid.x for asteroid in asteroids) + 1, max(asteroid.y for asteroid in asteroids) + 1
+    )
+    codes = [table.code(asteroid) for asteroid in asteroids]
+    best_vis = 0
+    best_pos = None
+    for station, code in zip(asteroids, codes):
+        vis = table.visible_count(code, codes)
+        if vis > best_vis:
+            best_vis = vis
+            best_pos = station
+
+    return best_vis, best_pos
+
+
+def find_best_station_numpy(
+    asteroids: List[Position], block_pairs: int = NUMPY_BLOCK_PAIRS
+) -> Tuple[int, Optional[Position]]:
+    """ find_best_station with numpy arrays, a block of stations at a time """
+    if np is None:
+        return find_best_station(asteroids)
+    if not asteroids:
+        return 0, None
+
+    width = max(asteroid.x for asteroid in asteroids) + 1
+    height = max(asteroid.y for asteroid in asteroids) + 1
+    # Same layout as DirectionTable, the gcd being computed once per step rather than per pair
+    stride = 2 * width
+    offset = (height - 1) * stride + width - 1
+    dy, dx = np.divmod(np.arange((2 * height - 1) * stride) - offset + width - 1, stride)
+    dx -= width - 1
+    reduction = np.gcd(dx, dy)
+    # The station itself is the (0, 0) step, counted once in every row
+    reduction[reduction == 0] = 1
+    directions = (dy // reduction * stride + dx // reduction).astype(np.int32)
+
+    codes = np.array([asteroid.y * stride + asteroid.x for asteroid in asteroids])
+    block_size = max(1, block_pairs // len(asteroids))
+    visible = np.empty(len(asteroids), dtype=np.int64)
+    for start in range(0, len(asteroids), block_size):
+        steps = codes[np.newaxis, :] - codes[start:start + block_size, np.newaxis]
+        seen = directions[steps + offset]
+        seen.sort(axis=1)
+        visible[start:start + block_size] = np.count_nonzero(seen[:, 1:] != seen[:, :-1], axis=1)
+
+    # argmax keeps the first best station, as the strict comparison of find_best_station
+    best = int(np.argmax(visible))
+    if visible[best] == 0:
+        return 0, None
+    return int(visible[best]), asteroids[best]
+
+
+def compare_directions(first: Direction, second: Direction) -> int:
+    """ Clockwise order of the directions, starting straight up, the y axis pointing down """
+    # Up included to down excluded is the first half turn
+    first_half = 0 if first[0] > 0 or (first[0] == 0 and first[1] < 0) else 1
+    second_half = 0 if second[0] > 0 or (second[0] == 0 and second[1] < 0) else 1
+    if first_half != second_half:
+        return first_half - second_half
+
+    # Within a half turn, the cross product tells which one comes first clockwise
+    return second[0] * first[1] - first[0] * second[1]
+
+
+def vaporization_order(station: Position, asteroids: List[Position]) -> List[Position]:
+    """ Asteroids in the order a laser turning clockwise from straight up vaporizes them """
+    per_direction: Dict[Direction, List[Position]] = {}
+    for asteroid in asteroids:
+        if asteroid != station:
+            per_direction.setdefault(direction(station, asteroid), []).append(asteroid)
+
+    ranked = []
+    for asteroid_direction, line in per_direction.items():
+        line.sort(key=lambda a: (a.x - station.x) ** 2 + (a.y - station.y) ** 2)
+        # An asteroid goes on the laser turn matching its rank on its line of sight
+        ranked.extend(
+            (rank, asteroid_direction, asteroid) for rank, asteroid in enumerate(line)
+        )
+
+    direction_key = cmp_to_key(compare_directions)
+    ranked.sort(key=lambda entry: (entry[0], direction_key(entry[1])))
+    return [asteroid for _, _, asteroid in ranked]
+
+
 def display_line(line: List[Any]) -> None:
     print(''.join(list(map(str, line))))
 
@@ -209,41 +360,12 @@ if __name__ == '__main__':
 # #.#.#.#####.####.###
 # ###.##.####.##.#..##"""
     input_map = str_to_map(input_str)
-    maps = build_relative_maps(input_map)
-    max_vis, best_pos, best_map = find_best_spot(maps)
-
-    line_of_sights = list(set(best_map.keys()))
-    line_of_sights.sort()
-    line_of_sights.reverse()
-    # print('\nLine of sights:')
-    # for pos in line_of_sights:
-    #     print(f'  {pos}')
-
-    for k in best_map.keys():
-        best_map[k].sort()
+    asteroids = asteroid_positions(input_map)
+    max_vis, best_pos = find_best_station_numpy(asteroids)
+    print(best_pos)
+    print(max_vis)
 
-    nb_asteroid = 0
-    idx = 0
     ASTEROID_NUMBER = int(os.environ.get('ASTEROID_NUMBER', '200'))
-    while True:
-        pos = best_map[line_of_sights[idx]]
-
-        if not pos:
-            # remove the now empty location from line of sights
-            line_of_sights.pop(idx)
-            # next loop without incrementing idx (just roll over if we removed the last entry)
-            idx = idx % len(line_of_sights)
-            continue
-        else:
-            asteroid = pos.pop(0)
-            nb_asteroid += 1
-
-        if nb_asteroid == ASTEROID_NUMBER:
-            break
-
-        idx = (idx + 1) % len(line_of_sights)
-
-    print(best_pos)
+    asteroid = vaporization_order(best_pos, asteroids)[ASTEROID_NUMBER - 1]
     print(asteroid)
-    print(asteroid.abs_pos)
-    print(asteroid.abs_pos.x * 100 + asteroid.abs_pos.y)
+    print(asteroid.x * 100 + asteroid.y)
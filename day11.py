@@ -1,8 +1,8 @@
 from dataclasses import dataclass, field
 from enum import Enum
-from input_utils import get_input
-from intcode import Program, read_memory, run_program
+from intcode import Program, load_memory, run_program
 from log_utils import log
+from pathfinder import ChunkedGrid, Position
 from typing import List, Set
 
 
@@ -20,23 +20,17 @@ class Direction(Enum):
         return Direction(new_direction)
 
 
-@dataclass(frozen=True)
-class Position:
-    x: int
-    y: int
-
-
 @dataclass
 class Hull:
-    tiles: List[List[int]]
+    tiles: ChunkedGrid = field(default_factory=ChunkedGrid)
     painted_tiles: Set[Position] = field(default_factory=set)
 
     def get_value(self, pos: Position) -> int:
-        return self.tiles[pos.y][pos.x]
+        return self.tiles[pos]
 
     def paint_tile(self, pos: Position, value: int) -> None:
         log(f"Painting {pos}")
-        self.tiles[pos.y][pos.x] = value
+        self.tiles[pos] = value
         self.painted_tiles.add(pos)
 
     def show(self) -> None:
@@ -47,7 +41,7 @@ class Hull:
             line_str = line_str.replace('1', '8')
             return line_str
 
-        lines = list(map(process_line, self.tiles))
+        lines = list(map(process_line, self.tiles.rows()))
         print('\n'.join(lines))
 
 
@@ -107,14 +101,10 @@ def paint_and_move(robot: Robot, hull: Hull) -> None:
 
 
 if __name__ == '__main__':
-    input_str = get_input('11')
-    start_memory = read_memory(input_str)
-
-    size = 100
-    robot = Robot(Direction.UP, Position(int(size/2), int(size/2)))
-    hull = Hull([
-        [0 for _ in range(size)] for _ in range(size)
-    ])
+    start_memory = load_memory('11')
+
+    robot = Robot(Direction.UP, Position(0, 0))
+    hull = Hull()
     hull.paint_tile(Position(robot.position.x, robot.position.y), 1)
 
     program = Program(
@@ -1,18 +1,19 @@
+from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from input_utils import get_input
-from intcode import Program, run_program, read_memory, EndProgram
+from intcode import Program, run_program, run_until_input, load_memory, EndProgram
 from log_utils import log
 import os
-from pathfinder import closest_tile, max_distance, Position
+from pathfinder import ChunkedGrid, FrontierExplorer, closest_tile, max_distance, Position
 import time
-from typing import List, Set
+from typing import Callable, Dict, Set
 
 
-AREA_SIZE = 50
-ROBOT_START = int(AREA_SIZE/2)
+ROBOT_START = 0
 DISPLAY = False
 DISPLAY_SLEEP = 0.01
+# Maps the area with a droid forked per branch, instead of walking a single droid around
+EXPLORE_WITH_FORKS = bool(os.environ.get('DAY15_FORKS'))
 
 
 class DirectionInstruction(Enum):
@@ -84,51 +85,65 @@ class Robot:
         self.position = direction.move(self.position)
 
 
-def starting_area():
-    area = (
-        [[Tile.OUT for _ in range(AREA_SIZE)]] +
-        [[Tile.OUT] + [Tile.UNEXPLORED for _ in range(AREA_SIZE - 2)] + [Tile.OUT] for _ in range(AREA_SIZE - 2)] +
-        [[Tile.OUT for _ in range(AREA_SIZE)]]
-    )
-    area[ROBOT_START][ROBOT_START] = Tile.EMPTY
+# Tiles the robot cannot go through
+BLOCKING_TILES = {Tile.WALL.value, Tile.OUT.value}
+# Tiles the searches on the mapped area cannot go through, keeping them out of the unexplored
+MAPPED_BLOCKING_TILES = BLOCKING_TILES | {Tile.UNEXPLORED.value}
+
+
+def starting_area() -> ChunkedGrid:
+    area = ChunkedGrid(fill=Tile.UNEXPLORED.value)
+    area[Position(ROBOT_START, ROBOT_START)] = Tile.EMPTY.value
     return area
 
 
 @dataclass
 class Area:
-    tiles: List[List[Tile]] = field(default_factory=starting_area)
-    robot: Robot = Robot()
+    tiles: ChunkedGrid = field(default_factory=starting_area)
+    robot: Robot = field(default_factory=Robot)
     current_instruction: DirectionInstruction = DirectionInstruction.NORTH
-    current_path: List[Position] = None
     tank_position: Position = None
+    explorer: FrontierExplorer = None
+
+    def __post_init__(self):
+        if self.explorer is None:
+            self.explorer = FrontierExplorer(
+                self.tiles, Tile.UNEXPLORED.value, BLOCKING_TILES, self.robot.position
+            )
 
-    def display(self, force=False) -> None:
+    def display(self, force=False, labels: Dict[Position, int] = None) -> None:
         if not DISPLAY and not force:
             return
 
+        labels = labels or {}
         os.system('clear')
-        for idx, line in enumerate(self.tiles):
-            pretty_line = list(map(render_tile, line))
-
-            if idx == self.robot.position.y:
-                pretty_line[self.robot.position.x] = 'D'
+        for y in range(self.tiles.top_left.y, self.tiles.bottom_right.y + 1):
+            pretty_line = []
+            for x in range(self.tiles.top_left.x, self.tiles.bottom_right.x + 1):
+                position = Position(x, y)
+                if position == self.robot.position:
+                    pretty_line.append('D')
+                elif position in labels:
+                    pretty_line.append(render_tile(labels[position]))
+                else:
+                    pretty_line.append(render_tile(Tile(self.tiles[position])))
 
             print(''.join(pretty_line))
 
         time.sleep(DISPLAY_SLEEP)
 
     def get_tile_at_position(self, position: Position) -> Tile:
-        return self.tiles[position.y][position.x]
+        return Tile(self.tiles[position])
 
     def set_tile_under_robot(self, tile: Tile) -> None:
-        self.tiles[self.robot.position.y][self.robot.position.x] = tile
+        self.explorer.reveal(self.robot.position, tile.value)
 
     def set_tile_in_front_of_robot(self, tile: Tile) -> None:
         in_front = self.current_instruction.move(self.robot.position)
-        self.tiles[in_front.y][in_front.x] = tile
+        self.explorer.reveal(in_front, tile.value)
 
     def move_robot(self):
-        self.robot.move(area.current_instruction)
+        self.robot.move(self.current_instruction)
 
 
 def send_instruction(area: Area):
@@ -161,18 +176,10 @@ def update_area_map(area: Area):
         if value == StatusNotification.MOVED_AND_TANK_FOUND.value:
             log(f'Found oxygen at {area.robot.position}')
 
-        if not area.current_path:
-            closest = closest_tile(
-                area.tiles, area.robot.position, Tile.UNEXPLORED, {Tile.WALL, Tile.OUT}
-            )
-            if closest is None:
-                raise EndProgram('Entire map discovered')
-
-            next_tile_pos, path = closest
-            area.current_path = path
-            log(f'At {area.robot.position}. Going to {next_tile_pos}')
+        next_tile = area.explorer.next_step()
+        if next_tile is None:
+            raise EndProgram('Entire map discovered')
 
-        next_tile = area.current_path.pop(0)
         area.current_instruction = DirectionInstruction.direction_to(
             area.robot.position, next_tile
         )
@@ -183,35 +190,92 @@ def update_area_map(area: Area):
     return output_function
 
 
+def move_droid(
+    droid: Program, instruction: DirectionInstruction,
+    run: Callable[[Program], Program] = run_program
+) -> StatusNotification:
+    droid.feed([instruction.value])
+    run(droid)
+    return StatusNotification(droid.outputs.pop())
+
+
+def explore_with_forks(
+    area: Area, droid: Program, run: Callable[[Program], Program] = run_program
+) -> int:
+    """
+    Maps the whole area without a droid ever walking back.
+
+    droid, without I/O functions, waits for its first move at the robot position. Before each
+    move into the unexplored, the droid is forked, and every droid that finds a new tile goes on
+    exploring from there, breadth first. Returns the number of droids used.
+    """
+    droids = deque([(area.robot.position, droid)])
+    droid_count = 1
+    while droids:
+        position, droid = droids.popleft()
+        instructions = [
+            instruction for instruction in DirectionInstruction
+            if area.get_tile_at_position(instruction.move(position)) == Tile.UNEXPLORED
+        ]
+        for idx, instruction in enumerate(instructions):
+            # The last move can take the droid itself, nothing is left to try from here
+            if idx < len(instructions) - 1:
+                moving_droid = droid.fork()
+                droid_count += 1
+            else:
+                moving_droid = droid
+
+            next_position = instruction.move(position)
+            status = move_droid(moving_droid, instruction, run)
+            if status == StatusNotification.WALL:
+                area.tiles[next_position] = Tile.WALL.value
+                continue
+
+            if status == StatusNotification.MOVED_AND_TANK_FOUND:
+                area.tank_position = next_position
+                area.tiles[next_position] = Tile.OXYGEN.value
+            else:
+                area.tiles[next_position] = Tile.EMPTY.value
+            droids.append((next_position, moving_droid))
+
+        area.display()
+
+    return droid_count
+
+
 if __name__ == '__main__':
-    input_str = get_input('15')
-    memory = read_memory(input_str)
+    memory = load_memory('15')
     area = Area()
     area.display()
 
-    program = Program(
-        memory,
-        0,
-        send_instruction(area),
-        update_area_map(area)
-    )
-
-    run_program(program)
+    if EXPLORE_WITH_FORKS:
+        droid = run_until_input(Program(memory, 0))
+        droid_count = explore_with_forks(area, droid)
+        log(f'Area mapped with {droid_count} droids', 'DROIDS')
+    else:
+        program = Program(
+            memory,
+            0,
+            send_instruction(area),
+            update_area_map(area),
+            compiled=True,
+        )
+        run_program(program)
 
-    # At the end of the program, the robot is on the tank
     tank_pos = area.tank_position
     print(f'tank_pos {tank_pos}')
     _, shortest_path = closest_tile(
-        area.tiles, Position(ROBOT_START, ROBOT_START), Tile.OXYGEN, {Tile.WALL, Tile.OUT}
+        area.tiles, Position(ROBOT_START, ROBOT_START), Tile.OXYGEN.value, MAPPED_BLOCKING_TILES
     )
     print(len(shortest_path))
     area.display(force=True)
     print(f'tank_pos {tank_pos}')
 
-    tiles_per_distance = max_distance(area.tiles, tank_pos, {Tile.WALL, Tile.OUT})
+    tiles_per_distance = max_distance(area.tiles, tank_pos, MAPPED_BLOCKING_TILES)
+    distance_labels = {}
     for dist, tiles in tiles_per_distance.items():
         for tile in tiles:
-            area.tiles[tile.y][tile.x] = dist % 10
+            distance_labels[tile] = dist % 10
 
-    area.display(force=True)
+    area.display(force=True, labels=distance_labels)
     print(max(list(tiles_per_distance.keys())))
@@ -1,8 +1,7 @@
 from copy import deepcopy
 from dataclasses import dataclass, field
 from enum import Enum
-from input_utils import get_input
-from intcode import Program, read_memory, run_program
+from intcode import Program, load_memory, run_program
 from log_utils import log
 from pathfinder import Position
 from typing import Dict, List, Optional, Set, Tuple
@@ -30,7 +29,7 @@ class Camera:
 
 @dataclass
 class Robot:
-    camera: Camera = Camera()
+    camera: Camera = field(default_factory=Camera)
     planned_path: str = ''
     position: Position = None
     facing: RobotFacing = RobotFacing.UP
@@ -39,7 +38,7 @@ class Robot:
 
 @dataclass
 class Ship:
-    robot: Robot = Robot()
+    robot: Robot = field(default_factory=Robot)
     scaffold_map: List[List[str]] = field(default_factory=list)
     intersections: Set[Position] = field(default_factory=set)
     n_grams_with_count: Dict[int, Tuple[int, Set[str]]] = field(default_factory=dict)
@@ -214,82 +213,18 @@ class Ship:
             self.n_grams_with_count[size] = (len(words), words)
 
 
-def get_camera_value(ship: Ship):
-
-    def output_function(program: Program, value: int) -> Program:
-        ship.robot.camera.read_data += chr(value)
-        return program
-
-    return output_function
-
-
 main_movement_routine = 'A,B,B,A,B,C,A,C,B,C\n'
-# a = ['L', ',', 4, ',', 'L', ',', 6, ',', 'L', ',', 8, ',', 'L', ',', 12, '\n']
-# b = ['L', ',', 8, ',', 'R', ',', 12, ',', 'L', ',', 12, '\n']
-# c = ['R', ',', 12, ',', 'L', ',', 6, ',', 'L', ',', 6, ',', 'L', ',', 8, '\n']
 a = 'L,4,L,6,L,8,L,12\n'
 b = 'L,8,R,12,L,12\n'
 c = 'R,12,L,6,L,6,L,8\n'
 end = 'n\n'
-def solution_in():
-
-    def input_function(program: Program, position: int) -> Program:
-        global main_movement_routine
-        global a
-        global b
-        global c
-        global end
-
-        if main_movement_routine:
-            next_char = main_movement_routine[0]
-            main_movement_routine = main_movement_routine[1:]
-        elif a:
-            next_char = a[0]
-            a = a[1:]
-        elif b:
-            next_char = b[0]
-            b = b[1:]
-        elif c:
-            next_char = c[0]
-            c = c[1:]
-        elif end:
-            next_char = end[0]
-            end = end[1:]
-        else:
-            raise ValueError('')
-
-        # if type(next_char) == int:
-        #     instr = next_char
-        # else:
-        #     instr = ord(next_char)
-        # print(f'Sending {next_char}: {instr}')
-        print(f'Sending {next_char}: {ord(next_char)}')
-
-        program.set_memory(position, ord(next_char))
-        return program
-
-    return input_function
-
-
-def solution_out():
-    def output_function(program: Program, value: int) -> Program:
-        print(f'Solution: {value}')
-        return program
-
-    return output_function
-
 
 
 if __name__ == '__main__':
-    input_str = get_input('17')
+    memory = load_memory('17')
     ship = Ship()
-    program = Program(
-        read_memory(input_str),
-        0,
-        solution_in(),
-        get_camera_value(ship)
-    )
-    program = run_program(program)
+    program = run_program(Program(list(memory), 0))
+    ship.robot.camera.read_data = program.read_ascii()
     ship.make_scaffold_map()
     ship.display_scaffold_map()
     # ship.compute_intersections()
@@ -302,13 +237,10 @@ if __name__ == '__main__':
     ship.compute_n_grams()
     log(f'n-grams: {ship.n_grams_with_count}', 'N_GRAM')
 
-    print(input_str)
-    new_input = '2' + input_str[1:]
-    print(new_input)
-    program = Program(
-        read_memory(new_input),
-        0,
-        solution_in(),
-        solution_out()
-    )
+    # Waking the robot up
+    memory[0] = 2
+    program = Program(memory, 0)
+    program.write_ascii(main_movement_routine + a + b + c + end)
     run_program(program)
+    print(program.read_ascii())
+    print(f'Solution: {program.outputs[-1]}')
@@ -1,9 +1,10 @@
 from dataclasses import dataclass, field
 from enum import Enum
+from heapq import heappop, heappush
 from input_utils import get_input
 from log_utils import log
 from pathfinder import *
-from typing import Callable, List, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 
 @dataclass
@@ -29,10 +30,15 @@ class Key:
     position: Position
 
 
+def key_bit(symbol: str) -> int:
+    """ Bit of a key in a set of keys, also used for the door it opens """
+    return 1 << (ord(symbol.lower()) - ord('a'))
+
+
 @dataclass
 class Labyrinth:
     tile_map: List[List[Tile]]
-    entrance: Position
+    entrances: List[Position]
     doors: Set[Door]
     keys: Set[Key]
     collected_keys: Set[Key] = field(default_factory=set)
@@ -43,20 +49,50 @@ class Labyrinth:
         tile_map = [
             [0 for _ in range(len(list(lines[0])))] for _ in range(len(lines))
         ]
-        entrance = None
+        entrances = []
         doors = []
         keys = []
         for y, line in enumerate(lines):
             for x, tile in enumerate(list(line)):
                 tile_map[y][x] = Tile(tile)
                 if tile == '@':
-                    entrance = Position(x, y)
+                    entrances.append(Position(x, y))
                 elif tile.islower():
                     keys.append(Key(tile, Position(x, y)))
                 elif tile.isupper():
                     doors.append(Door(tile, Position(x, y)))
 
-        return Labyrinth(tile_map, entrance, doors, keys)
+        return Labyrinth(tile_map, entrances, doors, keys)
+
+    def split_entrance(self) -> 'Labyrinth':
+        """ Same labyrinth, with walls around the entrance and a robot in each corner """
+        entrance = self.entrances[0]
+        tile_map = [list(line) for line in self.tile_map]
+        for dy in range(-1, 2):
+            for dx in range(-1, 2):
+                tile = '@' if dx and dy else '#'
+                tile_map[entrance.y + dy][entrance.x + dx] = Tile(tile)
+        entrances = [
+            Position(entrance.x + dx, entrance.y + dy) for dy in (-1, 1) for dx in (-1, 1)
+        ]
+
+        return Labyrinth(tile_map, entrances, self.doors, self.keys)
+
+    def key_graph(self) -> DistanceMatrix:
+        """
+        Distances between the entrances, keys and doors, labelled '@0', '@1'... and by symbol.
+
+        Only the points reached without crossing another one are linked: a route over a door or
+        a key goes through its point.
+        """
+        grid = Grid.from_rows(self.tile_map, encode=lambda tile: ord(tile.value))
+        points = {f'@{idx}': entrance for idx, entrance in enumerate(self.entrances)}
+        points.update({key.symbol: key.position for key in self.keys})
+        points.update({door.symbol: door.position for door in self.doors})
+
+        return distance_matrix(
+            grid, points, unauthorized_tile_values={ord('#')}, through_targets=False
+        )
 
     def print_map(self, with_path: Path = None) -> None:
 
@@ -76,10 +112,6 @@ class Labyrinth:
 def authorized_tile_for_labyrinth(labyrinth: Labyrinth) -> Callable[[Position], bool]:
 
     def authorized_tile(pos: Position) -> bool:
-
-        if pos == Position(2, 19):
-            import ipdb; ipdb.set_trace()
-
         tile = labyrinth.tile_map[pos.y][pos.x]
         if tile.is_wall():
             return False
@@ -90,19 +122,81 @@ def authorized_tile_for_labyrinth(labyrinth: Labyrinth) -> Callable[[Position],
 
     return authorized_tile
 
+
+def collect_keys(labyrinth: Labyrinth) -> Optional[int]:
+    """
+    Fewest steps for the robots to collect all the keys, None if they cannot.
+
+    Dijkstra over the states of the key graph: the point each robot stands on, and the bitmask of
+    the keys collected. From a state, each robot can go for the keys it reaches through the
+    doors it holds the key of, without walking over a key it has not collected yet.
+    """
+    graph = labyrinth.key_graph()
+    routes = {label: graph.routes(label) for label in graph.labels}
+    reachable: Dict[Tuple[str, int], List[Tuple[str, int]]] = {}
+
+    def reachable_keys(point: str, collected: int) -> List[Tuple[str, int]]:
+        """ Keys not collected yet the robot on point can go for, with their distance """
+        keys = reachable.get((point, collected))
+        if keys is not None:
+            return keys
+
+        keys = []
+        distances = {point: 0}
+        heap = [(0, point)]
+        while heap:
+            distance, label = heappop(heap)
+            if distance > distances[label]:
+                continue
+            if label.islower() and not collected & key_bit(label):
+                # Walking on, the robot would pick this key up first
+                keys.append((label, distance))
+                continue
+
+            for target, step, _ in routes[label]:
+                if target.isupper() and not collected & key_bit(target):
+                    continue
+                if distance + step < distances.get(target, distance + step + 1):
+                    distances[target] = distance + step
+                    heappush(heap, (distance + step, target))
+
+        reachable[(point, collected)] = keys
+        return keys
+
+    all_keys = 0
+    for key in labyrinth.keys:
+        all_keys |= key_bit(key.symbol)
+
+    start = (tuple(f'@{idx}' for idx in range(len(labyrinth.entrances))), 0)
+    best_steps = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        steps, state = heappop(heap)
+        robots, collected = state
+        if collected == all_keys:
+            return steps
+        if steps > best_steps[state]:
+            # Reached again in fewer steps since it was pushed
+            continue
+
+        for robot_idx, point in enumerate(robots):
+            for target, distance in reachable_keys(point, collected):
+                next_state = (
+                    robots[:robot_idx] + (target,) + robots[robot_idx + 1:],
+                    collected | key_bit(target),
+                )
+                next_steps = steps + distance
+                if next_steps < best_steps.get(next_state, next_steps + 1):
+                    best_steps[next_state] = next_steps
+                    heappush(heap, (next_steps, next_state))
+
+    return None
+
+
 if __name__ == '__main__':
     input_str = get_input('18')
     labyrinth = Labyrinth.process_map(input_str)
     log(labyrinth, 'LABYRINTH')
 
-    for key in labyrinth.keys:
-        path = shortest_path(
-            labyrinth.tile_map,
-            labyrinth.entrance,
-            key.position,
-            authorized_tile_for_labyrinth(labyrinth),
-        )
-        if path:
-            print(key)
-            print(path)
-            labyrinth.print_map(with_path=path)
+    print(f'Solution 1: {collect_keys(labyrinth)}')
+    print(f'Solution 2: {collect_keys(labyrinth.split_entrance())}')
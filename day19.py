@@ -1,20 +1,24 @@
-from copy import deepcopy
 from dataclasses import dataclass, field
 from enum import Enum
-from input_utils import get_input
-from intcode import Program, read_memory, run_program
+from intcode import Program, ProgramQuery, load_memory, run_program, run_until_input
 from log_utils import log
 import math
+import os
 from pathfinder import Position
 import sys
-from typing import Callable, Dict, List, Set
+from typing import Callable, Dict, List, Optional, Set
 
 
 @dataclass
 class PointValueComputer:
     memory: List[int]
-    _value: int = -1
-    _instructions: List[int] = field(default_factory=list)
+    cache_path: Optional[str] = None
+    query: ProgramQuery = field(init=False)
+
+    def __post_init__(self):
+        # The drone program is a pure function of the point coordinates: the points already
+        # probed are answered from the query cache
+        self.query = ProgramQuery(self.memory, cache_path=self.cache_path)
 
     def get_point_as_string(self, pos: Position) -> int:
         value = self.get_point_value(pos)
@@ -24,30 +28,7 @@ class PointValueComputer:
             return '.'
 
     def get_point_value(self, pos: Position) -> int:
-        self._instructions = [pos.x, pos.y]
-        program = Program(
-            deepcopy(self.memory),
-            0,
-            self.send_robot_coordinates(),
-            self.set_tractor_beam_field()
-        )
-
-        run_program(program)
-
-        return self._value
-
-    def send_robot_coordinates(self) -> Callable[[Program, int], Program]:
-        def input_function(program: Program, position: int) -> Program:
-            program.set_memory(position, self._instructions.pop(0))
-            return program
-        return input_function
-
-
-    def set_tractor_beam_field(self) -> Callable[[Program, int], Program]:
-        def output_function(program: Program, value: int) -> Program:
-            self._value = value
-            return program
-        return output_function
+        return self.query(pos.x, pos.y)[-1]
 
 
 @dataclass
@@ -99,9 +80,9 @@ class World:
             ]
             print('{:<12}'.format(str(idx + from_line)) + "".join(data))
 
-    def init_world(self, memory: List[int]) -> None:
+    def init_world(self, memory: List[int], pvc: PointValueComputer = None) -> None:
         self._memory = memory
-        self._pvc = PointValueComputer(memory)
+        self._pvc = pvc or PointValueComputer(memory)
 
     def compute_tractor_beam_field(self, from_line, to_line) -> None:
         pass
@@ -217,16 +198,17 @@ def get_line_details(memory, offset, nb_lines = 1):
         Position(int(offset / 4), offset)
     )
 
-    program = Program(
-        deepcopy(memory),
-        0,
-        send_robot_coordinates(world),
-        set_tractor_beam_field(world)
+    waiting_program = run_until_input(
+        Program(
+            list(memory),
+            0,
+            send_robot_coordinates(world),
+            set_tractor_beam_field(world)
+        )
     )
 
     while True:
-        program.reset(deepcopy(memory))
-        program = run_program(program)
+        run_program(waiting_program.fork())
 
         # if world.tractor_beam_field and world.tractor_beam_field[-1].is_full:
         #     world.display_tractor_beam_field(OFFSET, OFFSET + 20, 0, 40)
@@ -303,9 +285,8 @@ def dichotomy(world, width, min_bound: int, max_bound: int) -> int:
 
 
 if __name__ == '__main__':
-    input_str = get_input('19')
-    memory = read_memory(input_str)
-    pvc = PointValueComputer(memory)
+    memory = load_memory('19')
+    pvc = PointValueComputer(memory, os.environ.get('DAY19_CACHE'))
 
     # for y in range(40, 80):
     #     sys.stdout.write('{:<12}'.format(str(y)))
@@ -315,7 +296,7 @@ if __name__ == '__main__':
     #     sys.stdout.write('\n')
 
     world = World(0, Position(0,0))
-    world.init_world(memory)
+    world.init_world(memory, pvc)
     # for i in range(6, 13):
     #     world.compute_line(i)
     #     print(world.tractor_beam_field[i])
@@ -349,6 +330,10 @@ if __name__ == '__main__':
 
         sys.stdout.write('\n')
 
+    print(f'Drone queries: {pvc.query.hits} cache hits, {pvc.query.misses} program runs')
+    if pvc.cache_path:
+        pvc.query.save()
+
     # line_idx = OFFSET
     # while True:
     #     line = get_line_details(memory, line_idx)
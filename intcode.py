@@ -1,14 +1,34 @@
-from dataclasses import dataclass
+from array import array
+import asyncio
+import atexit
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import partial
+import hashlib
+import itertools
+import json
 from log_utils import log
+import mmap
 import os
-from typing import Callable, List
+import time
+from types import CodeType, FunctionType
+from typing import (
+    Callable, Deque, Dict, Generator, Iterable, List, Optional, Set, Tuple, TypeVar, Union
+)
 
 
 class EndProgram(Exception):
     pass
 
 
+class ProgramStatus(Enum):
+    RUNNING = 0
+    HALTED = 1
+    WAITING_INPUT = 2
+
+
 class ParamMode(Enum):
     Position = 0
     Value = 1
@@ -28,15 +48,58 @@ OPCODE_PARAM_COUNT = {
     99: 0,
 }
 
+# (opcode, parameter count, parameter mode flags) of an instruction, as decoded from its raw integer
+DecodedInstruction = Tuple[int, int, Tuple[int, ...]]
+
+_DECODED_INSTRUCTIONS: Dict[int, DecodedInstruction] = {}
+# Same, for the programs written before the relative mode (days 2 and 5)
+_POSITIONAL_DECODED_INSTRUCTIONS: Dict[int, DecodedInstruction] = {}
+
+# Memory past the end of the program memory list is stored in pages of PAGE_SIZE cells
+PAGE_BITS = 10
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+# 64 bits integers, or a list once a value of the page does not fit
+Page = Union[array, List[int]]
+
 
 @dataclass
 class Program:
     memory: List[int]
-    instr_pointer: int
-    input_function: Callable[['Program', int], 'Program']
-    output_function: Callable[['Program', int], 'Program']
+    instr_pointer: int = 0
+    # Without I/O functions, inputs are taken from the inputs queue, and outputs appended to outputs
+    input_function: Optional[Callable[['Program', int], 'Program']] = None
+    output_function: Optional[Callable[['Program', int], 'Program']] = None
     _instr_pointer_modified: bool = False
     relative_base: int = 0
+    inputs: Deque[int] = field(default_factory=deque)
+    outputs: List[int] = field(default_factory=list)
+    status: ProgramStatus = ProgramStatus.RUNNING
+    debug: bool = field(default_factory=lambda: bool(os.environ.get('INTCODE_DEBUG')))
+    compiled: bool = False
+    # Runs pairs of instructions as superinstructions, see run_fused
+    fused: bool = False
+    # Without relative mode, the relative base instruction and parameters are invalid
+    relative_mode: bool = True
+    # Without pausing on input, reading an input with an empty inputs queue is an error
+    pause_on_input: bool = True
+    # Profiling counts every instruction run, and reports the hot spots once the process exits.
+    # All the programs profiled through INTCODE_PROFILE count in the same profiler.
+    profile: bool = field(default_factory=lambda: bool(os.environ.get('INTCODE_PROFILE')))
+    profiler: Optional['Profiler'] = field(default=None, repr=False)
+    _handlers: Dict[int, 'Handler'] = field(init=False, repr=False)
+    _compiled: Optional['CompiledCode'] = field(default=None, repr=False)
+    _fused: Optional['FusedCode'] = field(default=None, repr=False)
+    # Sparse memory, for the pages starting past the end of the memory list. Pages are shared
+    # with the forks of the program, till one of them writes to it.
+    _pages: Dict[int, Page] = field(default_factory=dict, repr=False)
+    _owned_pages: Set[int] = field(default_factory=set, repr=False)
+
+    def __post_init__(self):
+        self._handlers = DEBUG_HANDLERS if self.debug else HANDLERS
+        if self.profile and self.profiler is None:
+            self.profiler = process_profiler()
 
     def set_instr_pointer(self, value: int) -> 'Program':
         self.instr_pointer = value
@@ -45,16 +108,64 @@ class Program:
 
     def set_memory(self, pos: int, value: int) -> 'Program':
         if pos >= len(self.memory):
-            self.memory.extend([0] * (pos - len(self.memory) + 1))
+            page = pos >> PAGE_BITS
+            if (page << PAGE_BITS) >= len(self.memory) + PAGE_SIZE:
+                self._set_page_memory(page, pos & PAGE_MASK, value)
+                return self
+
+            # Close enough to the end of the memory list to simply grow it
+            self._grow_memory((page + 1) << PAGE_BITS)
 
         self.memory[pos] = value
+        if self._compiled is not None and pos in self._compiled.code_addresses:
+            self._compiled.modified(pos)
+        if self._fused is not None and pos in self._fused.code_addresses:
+            self._fused.modified(pos)
         return self
 
     def get_memory(self, pos: int) -> int:
-        if pos >= len(self.memory):
+        if pos < len(self.memory):
+            return self.memory[pos]
+
+        values = self._pages.get(pos >> PAGE_BITS)
+        if values is None:
             return 0
         else:
-            return self.memory[pos]
+            return values[pos & PAGE_MASK]
+
+    def _grow_memory(self, size: int) -> None:
+        start = len(self.memory)
+        self.memory.extend([0] * (size - start))
+        # Pages now covered by the memory list move into it
+        for page in range(start >> PAGE_BITS, size >> PAGE_BITS):
+            values = self._pages.pop(page, None)
+            if values is not None:
+                self.memory[page << PAGE_BITS:(page + 1) << PAGE_BITS] = values
+            self._owned_pages.discard(page)
+
+    def _set_page_memory(self, page: int, offset: int, value: int) -> None:
+        values = self._pages.get(page)
+        if values is None:
+            values = array('q', bytes(8 * PAGE_SIZE))
+            self._pages[page] = values
+            self._owned_pages.add(page)
+        elif page not in self._owned_pages:
+            # Copy on write of a page shared with a fork
+            values = values[:]
+            self._pages[page] = values
+            self._owned_pages.add(page)
+
+        try:
+            values[offset] = value
+        except OverflowError:
+            # Out of 64 bits: the page holds Python integers from now on
+            values = values.tolist()
+            self._pages[page] = values
+            values[offset] = value
+
+    def _share_pages(self) -> Dict[int, Page]:
+        self._owned_pages.clear()
+        return dict(self._pages)
 
     def move_instr_pointer(self, instr_params_count: int) -> 'Program':
         if self._instr_pointer_modified:
@@ -64,9 +175,202 @@ class Program:
 
         return self
 
+    def decoded_instr(self) -> DecodedInstruction:
+        return decode_instr(self.get_memory(self.instr_pointer), self.relative_mode)
+
+    def snapshot(self) -> 'ProgramSnapshot':
+        return ProgramSnapshot(
+            list(self.memory),
+            self.instr_pointer,
+            self.relative_base,
+            self.status,
+            self._share_pages(),
+        )
+
+    def restore(self, snapshot: 'ProgramSnapshot') -> None:
+        self.memory = list(snapshot.memory)
+        self.instr_pointer = snapshot.instr_pointer
+        self.relative_base = snapshot.relative_base
+        self.status = snapshot.status
+        self._pages = dict(snapshot.pages)
+        self._owned_pages = set()
+
+    def fork(
+        self,
+        input_function: Optional[Callable[['Program', int], 'Program']] = None,
+        output_function: Optional[Callable[['Program', int], 'Program']] = None,
+    ) -> 'Program':
+        """ Independent copy of the program in its current state, with its own I/O if given """
+        return Program(
+            list(self.memory),
+            self.instr_pointer,
+            input_function or self.input_function,
+            output_function or self.output_function,
+            relative_base=self.relative_base,
+            inputs=deque(self.inputs),
+            outputs=list(self.outputs),
+            status=self.status,
+            debug=self.debug,
+            compiled=self.compiled,
+            fused=self.fused,
+            relative_mode=self.relative_mode,
+            pause_on_input=self.pause_on_input,
+            profile=self.profile,
+            profiler=self.profiler,
+            _pages=self._share_pages(),
+        )
+
+    def feed(self, values: Iterable[int]) -> 'Program':
+        self.inputs.extend(values)
+        return self
+
+    def write_ascii(self, text: str) -> 'Program':
+        return self.feed(map(ord, text))
+
+    def read_ascii(self) -> str:
+        """ Takes the ASCII outputs as a string, leaving the other values in outputs """
+        text = ''.join([chr(value) for value in self.outputs if 0 <= value < 128])
+        self.outputs = [value for value in self.outputs if not 0 <= value < 128]
+        return text
+
+    def run_until_io(self) -> Generator[Optional[int], Union[int, Iterable[int], None], None]:
+        """
+        Runs the program as a generator, for programs without I/O functions.
+
+        Yields the outputs, then None when the program needs an input. Inputs can be sent back
+        (a value or several at once) at any point, or fed to the program before resuming.
+        """
+        while True:
+            run_program(self)
+
+            outputs, self.outputs = self.outputs, []
+            for value in outputs:
+                self._feed_sent((yield value))
+
+            if self.status == ProgramStatus.HALTED:
+                return
+
+            while not self.inputs:
+                self._feed_sent((yield None))
+
+    def _feed_sent(self, sent: Union[int, Iterable[int], None]) -> None:
+        if sent is None:
+            return
+        elif isinstance(sent, int):
+            self.inputs.append(sent)
+        else:
+            self.inputs.extend(sent)
+
     def reset(self, memory: List[int]) -> None:
         self.memory = memory
         self.instr_pointer = 0
+        self.relative_base = 0
+        self.status = ProgramStatus.RUNNING
+        self.inputs.clear()
+        self.outputs.clear()
+        self._pages = {}
+        self._owned_pages = set()
+
+
+@dataclass(frozen=True)
+class ProgramSnapshot:
+    memory: List[int]
+    instr_pointer: int
+    relative_base: int
+    status: ProgramStatus
+    pages: Dict[int, Page] = field(default_factory=dict)
+
+
+OPCODE_NAMES = {
+    1: 'add',
+    2: 'multiply',
+    3: 'input',
+    4: 'output',
+    5: 'jump-if-true',
+    6: 'jump-if-false',
+    7: 'less than',
+    8: 'equals',
+    9: 'relative base',
+    99: 'halt',
+}
+
+
+@dataclass
+class Profiler:
+    """ Execution counts of a program, filled in by run_program in profiling mode """
+    json_path: str = 'intcode_profile.json'
+    address_counts: Counter = field(default_factory=Counter)
+    opcode_counts: Counter = field(default_factory=Counter)
+    # Times the program paused, waiting for an input
+    input_waits: int = 0
+    # Highest number of memory cells allocated, in the memory list and in pages
+    memory_high_water: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def instructions(self) -> int:
+        return sum(self.opcode_counts.values())
+
+    @property
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.elapsed if self.elapsed else 0.0
+
+    def report(self, top: int = 20) -> str:
+        instructions = self.instructions
+        lines = [
+            f'{instructions:,} instructions in {self.elapsed:.3f}s: '
+            f'{self.instructions_per_second:,.0f} instructions/s',
+            f'{self.input_waits} input waits, memory high-water mark of '
+            f'{self.memory_high_water:,} cells',
+            '',
+            'opcode              count   share',
+        ]
+        for opcode, count in self.opcode_counts.most_common():
+            lines.append(
+                f'{opcode:>2} {OPCODE_NAMES[opcode]:<13} {count:>9,} {count / instructions:>7.1%}'
+            )
+        lines += ['', 'address             count   share']
+        for address, count in self.address_counts.most_common(top):
+            lines.append(f'{address:>16} {count:>9,} {count / instructions:>7.1%}')
+
+        return '\n'.join(lines)
+
+    def merge(self, other: 'Profiler') -> None:
+        """ Adds the counts of other, the profiler of another process """
+        self.address_counts.update(other.address_counts)
+        self.opcode_counts.update(other.opcode_counts)
+        self.input_waits += other.input_waits
+        self.memory_high_water = max(self.memory_high_water, other.memory_high_water)
+        self.elapsed += other.elapsed
+
+    def to_json(self) -> dict:
+        return {
+            'instructions': self.instructions,
+            'elapsed': self.elapsed,
+            'instructions_per_second': self.instructions_per_second,
+            'input_waits': self.input_waits,
+            'memory_high_water': self.memory_high_water,
+            'opcodes': {str(opcode): count for opcode, count in self.opcode_counts.most_common()},
+            'addresses': self.address_counts.most_common(),
+        }
+
+    def dump(self) -> None:
+        print(self.report())
+        with open(self.json_path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+
+_PROCESS_PROFILER: Optional[Profiler] = None
+
+
+def process_profiler() -> Profiler:
+    """ Profiler shared by the programs of the process, dumped once when it exits """
+    global _PROCESS_PROFILER
+    if _PROCESS_PROFILER is None:
+        _PROCESS_PROFILER = Profiler()
+        atexit.register(_PROCESS_PROFILER.dump)
+
+    return _PROCESS_PROFILER
 
 
 @dataclass
@@ -93,31 +397,79 @@ def read_memory(mem_str: str) -> List[int]:
     return list(map(int, mem_str.split(',')))
 
 
-def read_instr(int_instr: int) -> Instruction:
-    param_modes = list(map(lambda x: ParamMode(int(x)), str(int_instr)[:-2]))
-    param_modes.reverse()
-    return Instruction(
-        int(str(int_instr)[-2:]),
-        param_modes
-    )
+def write_image(memory: List[int], path: str) -> None:
+    """ Binary image of a memory: its cells as 64 bits integers, in the native byte order """
+    with open(path, 'wb') as f:
+        array('q', memory).tofile(f)
 
 
-def get_params(program: Program, opcode: int, param_modes: List[ParamMode]) -> List[Param]:
-    params = []
-    for idx in range(OPCODE_PARAM_COUNT[opcode]):
-        if idx >= len(param_modes):
-            mode = ParamMode.Position
-        else:
-            mode = param_modes[idx]
+def read_image(path: str) -> List[int]:
+    image = array('q')
+    with open(path, 'rb') as f:
+        image.frombytes(f.read())
+    return image.tolist()
 
-        params.append(
-            Param(
-                program.get_memory(program.instr_pointer + idx + 1),
-                mode
-            )
+
+def map_image(path: str) -> memoryview:
+    """ Read-only view of an image mapped in memory, the processes mapping it share its pages """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast('q')
+
+
+def load_memory(folder: str) -> List[int]:
+    """
+    Memory of the program in folder, read from its binary image.
+
+    The image is written from the input.csv file next to it when missing or out of date.
+    """
+    csv_path = os.path.join(folder, 'input.csv')
+    image_path = os.path.join(folder, 'input.img')
+    if not os.path.exists(image_path) or (
+        os.path.getmtime(image_path) < os.path.getmtime(csv_path)
+    ):
+        with open(csv_path) as f:
+            write_image(read_memory(f.read().strip()), image_path)
+
+    return read_image(image_path)
+
+
+def decode_instr(int_instr: int, relative_mode: bool = True) -> DecodedInstruction:
+    """ Decodes a raw instruction once, later calls for the same integer hit the cache """
+    decoded_instructions = (
+        _DECODED_INSTRUCTIONS if relative_mode else _POSITIONAL_DECODED_INSTRUCTIONS
+    )
+    decoded = decoded_instructions.get(int_instr)
+    if decoded is None:
+        if int_instr < 0:
+            # The modulo would read a valid opcode out of it, reject it as an unknown opcode
+            raise KeyError(int_instr)
+        opcode = int_instr % 100
+        param_count = OPCODE_PARAM_COUNT[opcode]
+        param_modes = tuple(
+            (int_instr // 10 ** (idx + 2)) % 10 for idx in range(param_count)
         )
+        if not relative_mode and (opcode == 9 or ParamMode.Relative.value in param_modes):
+            raise ValueError(f'Instruction {int_instr} needs the relative mode')
+        decoded = (opcode, param_count, param_modes)
+        decoded_instructions[int_instr] = decoded
 
-    return params
+    return decoded
+
+
+def read_instr(int_instr: int) -> Instruction:
+    opcode, _, param_modes = decode_instr(int_instr)
+    return Instruction(opcode, [ParamMode(mode) for mode in param_modes])
+
+
+_PARAM_MODES = (ParamMode.Position, ParamMode.Value, ParamMode.Relative)
+
+
+def get_params(program: Program, param_modes: Tuple[int, ...]) -> List[Param]:
+    return [
+        Param(program.get_memory(program.instr_pointer + idx + 1), _PARAM_MODES[mode])
+        for idx, mode in enumerate(param_modes)
+    ]
 
 
 def param_value(program: Program, param: Param, as_position: bool = False) -> int:
@@ -136,44 +488,973 @@ def param_value(program: Program, param: Param, as_position: bool = False) -> in
 
 
 def run_program(program: Program) -> Program:
+    if program.status == ProgramStatus.WAITING_INPUT:
+        program.status = ProgramStatus.RUNNING
+
     try:
-        while True:
-            program = handle_operation(program)
+        if program.profiler is not None:
+            run_profiled(program)
+        elif program.debug:
+            # Step by step, so that every instruction goes through the tracing handlers
+            while program.status == ProgramStatus.RUNNING:
+                program = handle_operation(program)
+        elif program.compiled:
+            run_compiled(program)
+        elif program.fused:
+            run_fused(program)
+        else:
+            execute(program)
     except EndProgram:
-        log("\n-- Program ended --\n", 'INTCODE')
+        # Raised by I/O functions that want to stop the program early
+        pass
+
+    log("\n-- Program ended --\n", 'INTCODE')
+    return program
+
+
+def run_until_input(program: Program) -> Program:
+    """
+    Runs the program up to its next input instruction, and pauses there.
+
+    This is the place to snapshot or fork a program whose start does not depend on its inputs.
+    """
+    if program.status == ProgramStatus.WAITING_INPUT:
+        program.status = ProgramStatus.RUNNING
+
+    if program.profiler is not None:
+        run_profiled(program, until_input=True)
+    elif program.debug:
+        while (
+            program.status == ProgramStatus.RUNNING and program.decoded_instr()[0] != 3
+        ):
+            program = handle_operation(program)
+        if program.status == ProgramStatus.RUNNING:
+            program.status = ProgramStatus.WAITING_INPUT
+    else:
+        execute(program, until_input=True)
 
     return program
 
 
+def run_profiled(program: Program, until_input: bool = False) -> None:
+    """ Runs the program step by step, counting every instruction in its profiler """
+    profiler = program.profiler
+    start = time.perf_counter()
+    try:
+        while program.status == ProgramStatus.RUNNING:
+            address = program.instr_pointer
+            opcode = program.decoded_instr()[0]
+            if until_input and opcode == 3:
+                program.status = ProgramStatus.WAITING_INPUT
+                return
+
+            handle_operation(program)
+            if program.status == ProgramStatus.WAITING_INPUT:
+                # The input instruction did not run, it will be counted once resumed
+                profiler.input_waits += 1
+                return
+
+            profiler.address_counts[address] += 1
+            profiler.opcode_counts[opcode] += 1
+            cells = len(program.memory) + len(program._pages) * PAGE_SIZE
+            if cells > profiler.memory_high_water:
+                profiler.memory_high_water = cells
+    finally:
+        profiler.elapsed += time.perf_counter() - start
+
+
+def execute(program: Program, until_input: bool = False) -> None:
+    """
+    Runs the program till it halts, keeping its state in locals.
+
+    Only I/O instructions and the memory accesses out of the current memory bounds go through
+    handle_operation, the state being written back to the program before and read again after.
+    With until_input, stops on the next input instruction, without running it.
+    """
+    relative_mode = program.relative_mode
+    # Picked once: instructions out of the program instruction set never make it to the table
+    decoded_instructions = (
+        _DECODED_INSTRUCTIONS if relative_mode else _POSITIONAL_DECODED_INSTRUCTIONS
+    )
+    mem = program.memory
+    ip = program.instr_pointer
+    rb = program.relative_base
+
+    while True:
+        try:
+            while True:
+                decoded = decoded_instructions.get(mem[ip])
+                if decoded is None:
+                    decoded = decode_instr(mem[ip], relative_mode)
+                opcode, _, modes = decoded
+
+                if opcode == 1 or opcode == 2 or opcode == 7 or opcode == 8:
+                    mode1, mode2, mode3 = modes
+                    a = mem[ip + 1]
+                    if mode1 == 0:
+                        a = mem[a]
+                    elif mode1 == 2:
+                        a = mem[rb + a]
+                    b = mem[ip + 2]
+                    if mode2 == 0:
+                        b = mem[b]
+                    elif mode2 == 2:
+                        b = mem[rb + b]
+                    target = mem[ip + 3]
+                    if mode3 == 2:
+                        target += rb
+
+                    if opcode == 1:
+                        mem[target] = a + b
+                    elif opcode == 2:
+                        mem[target] = a * b
+                    elif opcode == 7:
+                        mem[target] = 1 if a < b else 0
+                    else:
+                        mem[target] = 1 if a == b else 0
+                    ip += 4
+
+                elif opcode == 5 or opcode == 6:
+                    mode1, mode2 = modes
+                    a = mem[ip + 1]
+                    if mode1 == 0:
+                        a = mem[a]
+                    elif mode1 == 2:
+                        a = mem[rb + a]
+
+                    if (a != 0) == (opcode == 5):
+                        b = mem[ip + 2]
+                        if mode2 == 0:
+                            b = mem[b]
+                        elif mode2 == 2:
+                            b = mem[rb + b]
+                        ip = b
+                    else:
+                        ip += 3
+
+                elif opcode == 9:
+                    a = mem[ip + 1]
+                    if modes[0] == 0:
+                        a = mem[a]
+                    elif modes[0] == 2:
+                        a = mem[rb + a]
+                    rb += a
+                    ip += 2
+
+                else:
+                    # I/O and halt
+                    break
+
+        except IndexError:
+            # Out of the memory bounds: let the program grow its memory
+            pass
+
+        program.instr_pointer = ip
+        program.relative_base = rb
+        if until_input and decode_instr(program.get_memory(ip), relative_mode)[0] == 3:
+            program.status = ProgramStatus.WAITING_INPUT
+            return
+
+        handle_operation(program)
+        if program.status != ProgramStatus.RUNNING:
+            return
+
+        mem = program.memory
+        ip = program.instr_pointer
+        rb = program.relative_base
+
+
+# Status returned by compiled blocks along with the next instruction pointer and relative base
+_BLOCK_CONTINUE = 0
+_BLOCK_HALTED = 1
+_BLOCK_INTERPRET = 2
+
+# Longest straight run of instructions compiled in a single block
+MAX_BLOCK_SIZE = 256
+
+CompiledBlock = Callable[[int], Tuple[int, int, int]]
+
+_BLOCK_CODE: Dict[str, CodeType] = {}
+
+
+@dataclass
+class CompiledCode:
+    """
+    Python translation of a program memory, one function per jump target.
+
+    Blocks are compiled the first time execution reaches their address. They run until an
+    unconditional jump, a halt, or an instruction they cannot translate, and return the next
+    instruction pointer, the relative base and one of the _BLOCK_* statuses.
+
+    Writing over a compiled instruction drops the blocks containing it, and the overwritten
+    address becomes volatile: operands stored there are read from memory at run time, and an
+    opcode stored there is left to the interpreter.
+    """
+    program: Program
+    memory: List[int]
+    blocks: Dict[int, CompiledBlock] = field(default_factory=dict)
+    # address -> start of the blocks where the value at this address is compiled in
+    code_addresses: Dict[int, List[int]] = field(default_factory=dict)
+    volatile_addresses: Set[int] = field(default_factory=set)
+
+    def get_block(self, address: int) -> CompiledBlock:
+        block = self.blocks.get(address)
+        if block is None:
+            block = self.compile_block(address)
+            self.blocks[address] = block
+
+        return block
+
+    def compile_block(self, address: int) -> CompiledBlock:
+        source, addresses = block_source(
+            self.memory, address, self.volatile_addresses, self.program.relative_mode
+        )
+        for code_address in addresses:
+            self.code_addresses.setdefault(code_address, []).append(address)
+
+        code = _BLOCK_CODE.get(source)
+        if code is None:
+            log(source, 'INTCODE_COMPILE')
+            code = compile(source, f'<intcode block {address}>', 'exec')
+            _BLOCK_CODE[source] = code
+
+        namespace = {
+            'mem': self.memory,
+            'program': self.program,
+            'load': self.program.get_memory,
+            'store': self.program.set_memory,
+            'code': self.code_addresses,
+            'modified': self.modified,
+            'output': self.program.output_function or queue_output,
+        }
+        exec(code, namespace)
+        return namespace['block']
+
+    def modified(self, address: int) -> None:
+        log(f'Code modified at {address}', 'INTCODE')
+        self.volatile_addresses.add(address)
+        for block_address in self.code_addresses.pop(address, []):
+            self.blocks.pop(block_address, None)
+
+
+def _operand_source(address: int, memory: List[int], volatile_addresses: Set[int]) -> str:
+    if address in volatile_addresses:
+        return f'mem[{address}]'
+    return str(memory[address])
+
+
+def _read_source(mode: int, operand: str, var: str, lines: List[str], size: int = 0) -> str:
+    if mode == 1:
+        return operand
+    elif mode == 0 and operand.lstrip('-').isdigit():
+        return f'mem[{operand}]' if 0 <= int(operand) < size else f'load({operand})'
+    else:
+        lines.append(f'{var} = {"rb + " if mode == 2 else ""}{operand}')
+        return f'(mem[{var}] if {var} < len(mem) else load({var}))'
+
+
+def _write_source(
+    mode: int, operand: str, expression: str, next_address: Union[int, str], lines: List[str],
+    size: int = 0
+) -> None:
+    if mode == 0 and operand.lstrip('-').isdigit() and 0 <= int(operand) < size:
+        lines.append(f'mem[{operand}] = {expression}')
+        lines.append(f'if {operand} in code:')
+        lines.append(f'    modified({operand})')
+        lines.append(f'    return ({next_address}, rb, {_BLOCK_CONTINUE})')
+    else:
+        lines.append(f't = {"rb + " if mode == 2 else ""}{operand}')
+        lines.append('if t < len(mem):')
+        lines.append(f'    mem[t] = {expression}')
+        lines.append('else:')
+        lines.append(f'    store(t, {expression})')
+        lines.append('if t in code:')
+        lines.append('    modified(t)')
+        lines.append(f'    return ({next_address}, rb, {_BLOCK_CONTINUE})')
+
+
+def _instruction_source(
+    opcode: int, modes: Tuple[int, ...], operands: List[str], next_address: Union[int, str],
+    read_source: Callable[..., str], write_source: Callable[..., None], lines: List[str]
+) -> None:
+    """ Appends the source of an arithmetic, comparison, conditional jump or relative base """
+    if opcode in (1, 2, 7, 8):
+        a = read_source(modes[0], operands[0], 'a', lines)
+        b = read_source(modes[1], operands[1], 'b', lines)
+        if opcode == 1:
+            expression = f'{a} + {b}'
+        elif opcode == 2:
+            expression = f'{a} * {b}'
+        elif opcode == 7:
+            expression = f'(1 if {a} < {b} else 0)'
+        else:
+            expression = f'(1 if {a} == {b} else 0)'
+        lines.append(f'v = {expression}')
+        write_source(modes[2], operands[2], 'v', next_address, lines)
+
+    elif opcode == 5 or opcode == 6:
+        a = read_source(modes[0], operands[0], 'a', lines)
+        lines.append(f'if {a} {"!=" if opcode == 5 else "=="} 0:')
+        b_lines = []
+        b = read_source(modes[1], operands[1], 'b', b_lines)
+        lines.extend(f'    {line}' for line in b_lines)
+        lines.append(f'    return ({b}, rb, {_BLOCK_CONTINUE})')
+
+    else:
+        a = read_source(modes[0], operands[0], 'a', lines)
+        lines.append(f'rb += {a}')
+
+
+def block_source(
+    memory: List[int], address: int, volatile_addresses: Set[int], relative_mode: bool = True
+) -> Tuple[str, List[int]]:
+    """ Translates the instructions starting at address, also returns the addresses compiled in """
+    size = len(memory)
+    read_source = partial(_read_source, size=size)
+    write_source = partial(_write_source, size=size)
+    lines = []
+    addresses = []
+    for _ in range(MAX_BLOCK_SIZE):
+        try:
+            opcode, param_count, modes = decode_instr(memory[address], relative_mode)
+        except (IndexError, KeyError, ValueError):
+            opcode, param_count, modes = None, 0, ()
+
+        next_address = address + param_count + 1
+        if (
+            opcode is None or address in volatile_addresses or
+            next_address > size or any(mode > 2 for mode in modes)
+        ):
+            # Not something we can translate, let the interpreter run that instruction
+            lines.append(f'return ({address}, rb, {_BLOCK_INTERPRET})')
+            break
+
+        addresses.extend(
+            addr for addr in range(address, next_address) if addr not in volatile_addresses
+        )
+        operands = [
+            _operand_source(addr, memory, volatile_addresses)
+            for addr in range(address + 1, next_address)
+        ]
+        lines.append(f'# {address}: {memory[address:next_address]}')
+
+        if opcode == 3:
+            # The input may be missing, or written over compiled code: leave it to the interpreter
+            lines.append(f'return ({address}, rb, {_BLOCK_INTERPRET})')
+            break
+
+        elif opcode == 4:
+            a = read_source(modes[0], operands[0], 'a', lines)
+            lines.append(f'program.instr_pointer = {address}')
+            lines.append('program.relative_base = rb')
+            lines.append(f'output(program, {a})')
+
+        elif (opcode == 5 or opcode == 6) and modes[0] == 1 and operands[0].lstrip('-').isdigit():
+            # Constant condition: either always or never jumping
+            if (int(operands[0]) != 0) != (opcode == 5):
+                address = next_address
+                continue
+            b = read_source(modes[1], operands[1], 'b', lines)
+            lines.append(f'return ({b}, rb, {_BLOCK_CONTINUE})')
+            break
+
+        elif opcode == 99:
+            lines.append(f'return ({address}, rb, {_BLOCK_HALTED})')
+            break
+
+        else:
+            _instruction_source(
+                opcode, modes, operands, next_address, read_source, write_source, lines
+            )
+
+        address = next_address
+    else:
+        lines.append(f'return ({address}, rb, {_BLOCK_CONTINUE})')
+
+    body = '\n'.join(f'    {line}' for line in lines)
+    source = (
+        'def block(rb, mem=mem, program=program, load=load, store=store, code=code, '
+        'modified=modified, output=output):\n'
+        f'{body}\n'
+    )
+    return source, addresses
+
+
+def run_compiled(program: Program) -> None:
+    """
+    Runs the program till it halts through its compiled blocks.
+
+    The instructions the compiler does not translate are run one at a time by the interpreter.
+    """
+    compiled = program._compiled
+    if compiled is None or compiled.memory is not program.memory:
+        compiled = CompiledCode(program, program.memory)
+        program._compiled = compiled
+
+    blocks = compiled.blocks
+    get_block = compiled.get_block
+    ip = program.instr_pointer
+    rb = program.relative_base
+    while True:
+        block = blocks.get(ip)
+        if block is None:
+            block = get_block(ip)
+        ip, rb, status = block(rb)
+
+        if status != _BLOCK_CONTINUE:
+            program.instr_pointer = ip
+            program.relative_base = rb
+            if status == _BLOCK_HALTED:
+                program.status = ProgramStatus.HALTED
+                return
+
+            handle_operation(program)
+            if program.status != ProgramStatus.RUNNING:
+                return
+            ip = program.instr_pointer
+            rb = program.relative_base
+
+
+# Opcodes a superinstruction can start with, and the ones it can end with
+_FUSE_FIRST = {1, 2, 7, 8, 9}
+_FUSE_SECOND = {1, 2, 5, 6, 7, 8, 9}
+
+# Opcode, parameter modes and volatile operands of each instruction of a superinstruction
+Shape = Tuple[Tuple[int, Tuple[int, ...], Tuple[bool, ...]], ...]
+ThreadedEntry = Callable[[int, int], Tuple[int, int, int]]
+
+
+def find_basic_blocks(
+    memory: List[int], relative_mode: bool = True, start: int = 0, known: Set[int] = frozenset()
+) -> List[List[int]]:
+    """
+    Addresses of the instructions of each basic block reachable from start.
+
+    Only the jumps to constant addresses are followed: code only reached through computed jumps
+    is left out. The known instructions, from a previous analysis, are not analysed again.
+    """
+    instructions: Dict[int, DecodedInstruction] = {}
+    leaders = {start}
+    pending = [start]
+    while pending:
+        address = pending.pop()
+        while address not in instructions and address not in known:
+            try:
+                decoded = decode_instr(memory[address], relative_mode)
+            except (IndexError, KeyError, ValueError):
+                break
+            opcode, param_count, modes = decoded
+            next_address = address + param_count + 1
+            if next_address > len(memory):
+                break
+
+            instructions[address] = decoded
+            if opcode == 99:
+                break
+            if opcode == 5 or opcode == 6:
+                leaders.add(next_address)
+                if modes[1] == 1:
+                    leaders.add(memory[address + 2])
+                    pending.append(memory[address + 2])
+                if modes[0] == 1 and (memory[address + 1] != 0) == (opcode == 5):
+                    # Always jumping
+                    break
+            address = next_address
+
+    blocks = []
+    block = []
+    block_end = None
+    for address in sorted(instructions):
+        if block and (address in leaders or address != block_end):
+            blocks.append(block)
+            block = []
+        block.append(address)
+        opcode, param_count, _ = instructions[address]
+        block_end = None if opcode in (5, 6, 99) else address + param_count + 1
+    if block:
+        blocks.append(block)
+
+    return blocks
+
+
+def _unchecked_read_source(mode: int, operand: str, var: str, lines: List[str]) -> str:
+    if mode == 1:
+        return operand
+    lines.append(f'{var} = mem[{"rb + " if mode == 2 else ""}{operand}]')
+    return var
+
+
+def _unchecked_write_source(
+    mode: int, operand: str, expression: str, next_address: str, lines: List[str]
+) -> None:
+    lines.append(f't = {"rb + " if mode == 2 else ""}{operand}')
+    lines.append(f'mem[t] = {expression}')
+    lines.append('if t in code:')
+    lines.append('    modified(t)')
+    lines.append(f'    return ({next_address}, rb, {_BLOCK_CONTINUE})')
+
+
+def superinstruction_source(shape: Shape) -> str:
+    """
+    Function running the instructions of the shape, given the instruction pointer.
+
+    The first instruction indexes the memory list as is, like execute does: out of the memory
+    bounds, it raises an IndexError before changing anything. The second one goes through the
+    program memory accessors when out of bounds, having to complete once the first one ran.
+    Volatile operands are read from memory, the others are bound to the function parameters.
+    """
+    lines = []
+    params = []
+    length = 0
+    for idx, (opcode, modes, volatile) in enumerate(shape):
+        operands = [f'{"pq"[idx]}{param + 1}' for param in range(len(modes))]
+        params.extend(operands)
+        for param, operand in enumerate(operands):
+            if volatile[param]:
+                lines.append(f'{operand} = mem[ip + {length + param + 1}]')
+        length += len(modes) + 1
+        next_address = f'ip + {length}'
+        _instruction_source(
+            opcode, modes, operands, next_address,
+            _read_source if idx else _unchecked_read_source,
+            _write_source if idx else _unchecked_write_source,
+            lines,
+        )
+
+    lines.append(f'return (ip + {length}, rb, {_BLOCK_CONTINUE})')
+    body = '\n'.join(f'    {line}' for line in lines)
+    return (
+        f'def superinstruction(ip, rb, {", ".join(f"{param}=0" for param in params)}, '
+        'mem=None, load=None, store=None, code=None, modified=None):\n'
+        f'{body}\n'
+    )
+
+
+_SUPERINSTRUCTIONS: Dict[Shape, FunctionType] = {}
+
+
+def superinstruction(shape: Shape) -> FunctionType:
+    """ Function of the shape, to be bound to the operands and memory of an instruction """
+    function = _SUPERINSTRUCTIONS.get(shape)
+    if function is None:
+        source = superinstruction_source(shape)
+        log(source, 'INTCODE_COMPILE')
+        namespace = {}
+        exec(compile(source, f'<intcode superinstruction {shape}>', 'exec'), namespace)
+        function = namespace['superinstruction']
+        _SUPERINSTRUCTIONS[shape] = function
+
+    return function
+
+
+@dataclass
+class FusedCode:
+    """
+    Threaded code of a program memory: each instruction address maps to a function running the
+    instruction, along with its operands.
+
+    The functions are generated once per shape of instruction. Consecutive instructions of a
+    basic block are paired up, each pair running through a single function, in one dispatch.
+    The analysis starts from address 0, and again from every address reached through a
+    computed jump. Writing over an instruction drops the entries using it, and the overwritten
+    address becomes volatile: its value is read at run time from then on, and an opcode stored
+    there is left to the interpreter.
+    """
+    program: Program
+    memory: List[int]
+    superinstructions: Dict[int, int] = field(default_factory=dict)
+    # Instructions analysed so far
+    analysed: Set[int] = field(default_factory=set)
+    entries: Dict[int, ThreadedEntry] = field(default_factory=dict)
+    # Instructions left to the interpreter
+    interpreted: Set[int] = field(default_factory=set)
+    volatile_addresses: Set[int] = field(default_factory=set)
+    # address -> start of the entries built from the value at this address
+    code_addresses: Dict[int, List[int]] = field(default_factory=dict)
+
+    def _decode(self, address: int) -> Optional[DecodedInstruction]:
+        """ Decoded instruction at address, None if it cannot be threaded """
+        try:
+            decoded = decode_instr(self.memory[address], self.program.relative_mode)
+        except (IndexError, KeyError, ValueError):
+            return None
+        if (
+            address + decoded[1] + 1 > len(self.memory) or any(mode > 2 for mode in decoded[2]) or
+            address in self.volatile_addresses
+        ):
+            return None
+        return decoded
+
+    def _opcode(self, address: int) -> Optional[int]:
+        decoded = self._decode(address)
+        return None if decoded is None else decoded[0]
+
+    def analyse(self, start: int) -> None:
+        """ Pairs up the instructions of the basic blocks reachable from start, not seen yet """
+        blocks = find_basic_blocks(self.memory, self.program.relative_mode, start, self.analysed)
+        for block in blocks:
+            self.analysed.update(block)
+            idx = 0
+            while idx < len(block) - 1:
+                first, second = block[idx], block[idx + 1]
+                if self._opcode(first) in _FUSE_FIRST and self._opcode(second) in _FUSE_SECOND:
+                    self.superinstructions[first] = second
+                    idx += 2
+                else:
+                    idx += 1
+
+    def get_entry(self, address: int) -> Optional[ThreadedEntry]:
+        """ Entry of the instruction at address, None for the ones left to the interpreter """
+        if address not in self.analysed:
+            self.analyse(address)
+
+        decoded = self._decode(address)
+        if decoded is None or decoded[0] not in _FUSE_SECOND:
+            self.interpreted.add(address)
+            self.code_addresses.setdefault(address, []).append(address)
+            return None
+        instructions = [(address, decoded)]
+
+        second = self.superinstructions.get(address)
+        if second is not None and decoded[0] in _FUSE_FIRST:
+            second_decoded = self._decode(second)
+            if (
+                second_decoded is not None and second_decoded[0] in _FUSE_SECOND and
+                second == address + decoded[1] + 1
+            ):
+                instructions.append((second, second_decoded))
+
+        shape = []
+        operands = []
+        for instr_address, (opcode, param_count, modes) in instructions:
+            operand_addresses = range(instr_address + 1, instr_address + param_count + 1)
+            shape.append((
+                opcode,
+                modes,
+                tuple(addr in self.volatile_addresses for addr in operand_addresses),
+            ))
+            operands.extend(self.memory[addr] for addr in operand_addresses)
+            for code_address in range(instr_address, instr_address + param_count + 1):
+                if code_address not in self.volatile_addresses:
+                    self.code_addresses.setdefault(code_address, []).append(address)
+        function = superinstruction(tuple(shape))
+
+        # Same code, with the operands of these instructions and this program bound as defaults
+        entry = FunctionType(
+            function.__code__,
+            function.__globals__,
+            function.__name__,
+            tuple(operands) + (
+                self.memory,
+                self.program.get_memory,
+                self.program.set_memory,
+                self.code_addresses,
+                self.modified,
+            ),
+        )
+        self.entries[address] = entry
+        return entry
+
+    def modified(self, address: int) -> None:
+        log(f'Code modified at {address}', 'INTCODE')
+        self.volatile_addresses.add(address)
+        for entry_address in self.code_addresses.pop(address, []):
+            self.entries.pop(entry_address, None)
+            self.interpreted.discard(entry_address)
+
+
+def run_fused(program: Program) -> None:
+    """
+    Runs the program till it halts through its threaded code, superinstructions included.
+
+    I/O and halt instructions are run one at a time by the interpreter.
+    """
+    fused = program._fused
+    if fused is None or fused.memory is not program.memory:
+        fused = FusedCode(program, program.memory)
+        fused.analyse(0)
+        program._fused = fused
+
+    entries = fused.entries
+    interpreted = fused.interpreted
+    get_entry = fused.get_entry
+    ip = program.instr_pointer
+    rb = program.relative_base
+    while True:
+        entry = entries.get(ip)
+        if entry is None and ip not in interpreted:
+            entry = get_entry(ip)
+
+        if entry is not None:
+            try:
+                ip, rb, _ = entry(ip, rb)
+                continue
+            except IndexError:
+                # Out of the memory bounds: let the program grow its memory
+                pass
+
+        program.instr_pointer = ip
+        program.relative_base = rb
+        handle_operation(program)
+        if program.status != ProgramStatus.RUNNING:
+            return
+        ip = program.instr_pointer
+        rb = program.relative_base
+
+
+class NetworkDeadlockError(Exception):
+    """ Every program of a network not halted waits for an input that no program will send """
+    pass
+
+
+@dataclass
+class Network:
+    """
+    Programs wired together, each output of a program being an input of the programs it is
+    connected to. Programs have no I/O functions: each one runs as an asyncio task, waiting on its
+    own queue whenever it needs an input.
+    """
+    programs: Dict[str, Program] = field(default_factory=dict)
+    links: Dict[str, List[str]] = field(default_factory=dict)
+    # Every value output by each program
+    outputs: Dict[str, List[int]] = field(default_factory=dict)
+
+    def add(self, name: str, program: Program) -> 'Network':
+        self.programs[name] = program
+        self.links[name] = []
+        self.outputs[name] = []
+        return self
+
+    def connect(self, source: str, destination: str) -> 'Network':
+        self.links[source].append(destination)
+        return self
+
+    def chain(self, names: List[str]) -> 'Network':
+        for source, destination in zip(names, names[1:]):
+            self.connect(source, destination)
+        return self
+
+    def ring(self, names: List[str]) -> 'Network':
+        self.chain(names)
+        return self.connect(names[-1], names[0])
+
+    def broadcast(self, source: str, destinations: List[str]) -> 'Network':
+        for destination in destinations:
+            self.connect(source, destination)
+        return self
+
+    def send(self, name: str, values: Iterable[int]) -> 'Network':
+        self.programs[name].feed(values)
+        return self
+
+    async def run_program(
+        self, name: str, queues: Dict[str, 'asyncio.Queue[int]'], live: Set[str], waiting: Set[str]
+    ) -> Program:
+        program = self.programs[name]
+        destinations = self.links[name]
+        while True:
+            run_program(program)
+
+            for value in program.outputs:
+                for destination in destinations:
+                    queues[destination].put_nowait(value)
+                    waiting.discard(destination)
+            self.outputs[name].extend(program.outputs)
+            program.outputs.clear()
+
+            if program.status == ProgramStatus.HALTED:
+                live.discard(name)
+                self._check_deadlock(live, waiting)
+                return program
+
+            queue = queues[name]
+            if queue.empty():
+                waiting.add(name)
+                self._check_deadlock(live, waiting)
+            program.inputs.append(await queue.get())
+            while not queue.empty():
+                program.inputs.append(queue.get_nowait())
+
+    def _check_deadlock(self, live: Set[str], waiting: Set[str]) -> None:
+        if live and live <= waiting:
+            raise NetworkDeadlockError(f'Programs {sorted(live)} all wait for an input')
+
+    async def run_async(self) -> Dict[str, Program]:
+        queues = {name: asyncio.Queue() for name in self.programs}
+        # Programs not halted yet, and those of them waiting on an empty queue
+        live = set(self.programs)
+        waiting: Set[str] = set()
+        await asyncio.gather(
+            *[self.run_program(name, queues, live, waiting) for name in self.programs]
+        )
+        return self.programs
+
+    def run(self) -> Dict[str, Program]:
+        """ Runs all the programs till they halt, raises NetworkDeadlockError if they cannot """
+        return asyncio.run(self.run_async())
+
+
+Candidate = TypeVar('Candidate')
+Score = TypeVar('Score')
+
+# Memory image of the search, set once in each worker process
+_search_memory: Union[List[int], memoryview] = []
+
+
+def _init_search_worker(memory: Union[List[int], str]) -> None:
+    global _search_memory, _PROCESS_PROFILER
+    _search_memory = map_image(memory) if isinstance(memory, str) else memory
+    # Workers exit without running the atexit functions: their counts go back to the parent
+    _PROCESS_PROFILER = None
+
+
+def _best_candidate(
+    score: Callable[[List[int], Candidate], Optional[Score]], candidates: List[Candidate]
+) -> Tuple[Optional[Tuple[Candidate, Score]], Optional[Profiler]]:
+    """ Best of the candidates, along with the counts of the programs profiled to score them """
+    global _PROCESS_PROFILER
+    best = None
+    for candidate in candidates:
+        value = score(list(_search_memory), candidate)
+        if value is not None and (best is None or value > best[1]):
+            best = (candidate, value)
+
+    profiler, _PROCESS_PROFILER = _PROCESS_PROFILER, None
+    return best, profiler
+
+
+def parallel_search(
+    memory: Union[List[int], str],
+    candidates: Iterable[Candidate],
+    score: Callable[[List[int], Candidate], Optional[Score]],
+    max_workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> Optional[Tuple[Candidate, Score]]:
+    """
+    Scores every candidate in a pool of processes, returning the best one along with its score.
+
+    score gets a copy of the memory image, and returns None for the candidates to discard. It has
+    to be a module level function, for it to be sent to the worker processes. The image itself
+    is only sent once to each worker. It can also be the path of a binary image file, that the
+    workers map in memory without copying it.
+    """
+    candidates = iter(candidates)
+    with ProcessPoolExecutor(
+        max_workers, initializer=_init_search_worker, initargs=(memory,)
+    ) as executor:
+        futures = []
+        while True:
+            chunk = list(itertools.islice(candidates, chunk_size))
+            if not chunk:
+                break
+            futures.append(executor.submit(_best_candidate, score, chunk))
+
+        results = [future.result() for future in futures]
+
+    best = None
+    for result, profiler in results:
+        if profiler is not None:
+            process_profiler().merge(profiler)
+        if result is not None and (best is None or result[1] > best[1]):
+            best = result
+
+    return best
+
+
+@dataclass
+class ProgramQuery:
+    """
+    A program used as a pure function of its inputs, returning its outputs.
+
+    The program runs once up to its first input, every query then runs a fork of it. Results
+    are kept in a least recently used cache of max_size entries, saved to cache_path if given,
+    and loaded back from there as long as the program memory did not change.
+    """
+    memory: List[int]
+    max_size: int = 100000
+    cache_path: Optional[str] = None
+    hits: int = 0
+    misses: int = 0
+    _cache: 'OrderedDict[Tuple[int, ...], Tuple[int, ...]]' = field(
+        default_factory=OrderedDict, repr=False
+    )
+    _waiting_program: Optional[Program] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self._waiting_program = run_until_input(Program(list(self.memory), 0))
+        if self.cache_path is not None and os.path.exists(self.cache_path):
+            self.load()
+
+    def __call__(self, *inputs: int) -> Tuple[int, ...]:
+        outputs = self._cache.get(inputs)
+        if outputs is not None:
+            self.hits += 1
+            self._cache.move_to_end(inputs)
+            return outputs
+
+        self.misses += 1
+        program = run_program(self._waiting_program.fork().feed(inputs))
+        outputs = tuple(program.outputs)
+        self._cache[inputs] = outputs
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+        return outputs
+
+    @property
+    def memory_hash(self) -> str:
+        return hashlib.sha256(','.join(map(str, self.memory)).encode()).hexdigest()
+
+    def load(self) -> None:
+        with open(self.cache_path) as f:
+            data = json.load(f)
+        if data['memory_hash'] != self.memory_hash:
+            log(f'{self.cache_path} was saved for another program, ignoring it', 'INTCODE')
+            return
+
+        for inputs, outputs in data['results'][-self.max_size:]:
+            self._cache[tuple(inputs)] = tuple(outputs)
+
+    def save(self) -> None:
+        with open(self.cache_path, 'w') as f:
+            json.dump(
+                {'memory_hash': self.memory_hash, 'results': list(self._cache.items())}, f
+            )
+
+
 def handle_operation(program: Program) -> Program:
-    int_instr = program.get_memory(program.instr_pointer)
-    instr = read_instr(int_instr)
+    opcode, param_count, param_modes = program.decoded_instr()
 
-    params = get_params(program, instr.opcode, instr.parameter_modes)
+    params = get_params(program, param_modes)
 
-    method_name = f'handle_{str(instr.opcode)}'
-    method = globals()[method_name]
-    if os.environ.get('INTCODE_DEBUG'):
+    program = program._handlers[opcode](program, params)
+
+    # Move program to next instruction
+    program.move_instr_pointer(param_count + 1)
+
+    return program
+
+
+def with_debug(handler: 'Handler') -> 'Handler':
+
+    def debug_handler(program: Program, params: List[Param]) -> Program:
         print('-------')
-        print(f'Calling {method_name}')
+        print(f'Calling {handler.__name__}')
         print(f'with params: {params} of value {[param_value(program, param) for param in params]}')
         print(f'with instr_pointer: {program.instr_pointer}')
         print(f'with relative_base: {program.relative_base}')
         print(f'with memory: {program.memory}')
-    program = method(program, params)
-    if os.environ.get('INTCODE_DEBUG'):
+        program = handler(program, params)
         print('#######')
         print(f'outputs memory: {program.memory}')
         print(f'with relative_base: {program.relative_base}')
+        return program
 
-    # Move program to next instruction
-    program.move_instr_pointer(OPCODE_PARAM_COUNT[instr.opcode] + 1)
-
-    return program
+    return debug_handler
 
 
 def handle_1(program: Program, params: List[int]):
-    if os.environ.get('INTCODE_DEBUG'):
+    if program.debug:
         print('Summing')
         print(f'  {param_value(program, params[0])}')
         print(f'  {param_value(program, params[1])}')
@@ -187,8 +1468,8 @@ def handle_1(program: Program, params: List[int]):
 
 
 def handle_2(program: Program, params: List[int]):
-    if os.environ.get('MULTIPLYING'):
-        print('Summing')
+    if program.debug:
+        print('Multiplying')
         print(f'  {param_value(program, params[0])}')
         print(f'  {param_value(program, params[1])}')
         print(f'  and storing at {program.get_memory(params[2].value)}')
@@ -200,15 +1481,29 @@ def handle_2(program: Program, params: List[int]):
     return program
 
 
+def queue_output(program: Program, value: int) -> Program:
+    program.outputs.append(value)
+    return program
+
+
 def handle_3(program: Program, params: List[int]):
     position = param_value(program, params[0], as_position=True)
-    program = program.input_function(program, position)
+    if program.input_function is not None:
+        program = program.input_function(program, position)
+    elif program.inputs:
+        program.set_memory(position, program.inputs.popleft())
+    elif not program.pause_on_input:
+        raise ValueError(f'No input left for the instruction at {program.instr_pointer}')
+    else:
+        # Nothing to read yet: stay on this instruction till the program gets fed
+        program.status = ProgramStatus.WAITING_INPUT
+        program.set_instr_pointer(program.instr_pointer)
     return program
 
 
 def handle_4(program: Program, params: List[int]):
     value = param_value(program, params[0])
-    program = program.output_function(program, value)
+    program = (program.output_function or queue_output)(program, value)
     return program
 
 
@@ -261,4 +1556,27 @@ def handle_9(program: Program, params: List[int]):
 
 
 def handle_99(program: Program, params: List[int]):
-    raise EndProgram('Over')
+    program.status = ProgramStatus.HALTED
+    # Stay on the halt instruction
+    program.set_instr_pointer(program.instr_pointer)
+    return program
+
+
+Handler = Callable[[Program, List[Param]], Program]
+
+HANDLERS: Dict[int, Handler] = {
+    1: handle_1,
+    2: handle_2,
+    3: handle_3,
+    4: handle_4,
+    5: handle_5,
+    6: handle_6,
+    7: handle_7,
+    8: handle_8,
+    9: handle_9,
+    99: handle_99,
+}
+
+DEBUG_HANDLERS: Dict[int, Handler] = {
+    opcode: with_debug(handler) for opcode, handler in HANDLERS.items()
+}
@@ -1,5 +1,9 @@
+from array import array
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+from enum import Enum
+from heapq import heappop, heappush
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar, Union
 
 T = TypeVar("T")
 
@@ -15,107 +19,787 @@ class Path:
     positions: List[Position] = field(default_factory=list)
 
 
-def tile_content(tile_map: List[List[T]], position: Position) -> T:
-    if position.y >= len(tile_map) or position.x >= len(tile_map):
+class SearchStrategy(Enum):
+    BFS = 'bfs'
+    ASTAR = 'astar'
+    BIDIRECTIONAL = 'bidirectional'
+
+
+@dataclass
+class SearchStats:
+    """ Counters a search adds to, when given one """
+    expanded: int = 0
+
+
+@dataclass
+class Grid:
+    """
+    Rectangular grid of small integers, stored row after row in a flat array.
+
+    Cells are addressed by index. The rows are surrounded by a border of outside cells, so the
+    neighbours of every cell of the grid are at the fixed neighbor_offsets from its index, with
+    no bounds check.
+    """
+    width: int
+    height: int
+    fill: int = 0
+    outside: int = -1
+    # array type code, signed bytes by default
+    typecode: str = 'b'
+    cells: array = field(init=False, repr=False)
+    stride: int = field(init=False, repr=False)
+    # Same order as neighbors(): down, right, up, left
+    neighbor_offsets: Tuple[int, int, int, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.stride = self.width + 2
+        self.cells = array(self.typecode, [self.outside]) * (self.stride * (self.height + 2))
+        row = array(self.typecode, [self.fill]) * self.width
+        for y in range(self.height):
+            start = self.index(Position(0, y))
+            self.cells[start:start + self.width] = row
+        self.neighbor_offsets = (self.stride, 1, -self.stride, -1)
+
+    @staticmethod
+    def from_rows(
+        rows: List[List[T]], encode: Callable[[T], int] = int, outside: int = -1,
+        typecode: str = 'b'
+    ) -> 'Grid':
+        grid = Grid(len(rows[0]), len(rows), outside=outside, typecode=typecode)
+        for y, row in enumerate(rows):
+            start = grid.index(Position(0, y))
+            grid.cells[start:start + grid.width] = array(typecode, map(encode, row))
+
+        return grid
+
+    def index(self, position: Position) -> int:
+        return (position.y + 1) * self.stride + position.x + 1
+
+    def position(self, index: int) -> Position:
+        y, x = divmod(index, self.stride)
+        return Position(x - 1, y - 1)
+
+    def in_bounds(self, position: Position) -> bool:
+        return 0 <= position.x < self.width and 0 <= position.y < self.height
+
+    def __getitem__(self, position: Position) -> int:
+        if not self.in_bounds(position):
+            return self.outside
+        return self.cells[self.index(position)]
+
+    def __setitem__(self, position: Position, value: int) -> None:
+        if not self.in_bounds(position):
+            raise IndexError(f'{position} is out of the {self.width}x{self.height} grid')
+        self.cells[self.index(position)] = value
+
+    def rows(self) -> List[List[int]]:
+        return [
+            self.cells[self.index(Position(0, y)):self.index(Position(self.width, y))].tolist()
+            for y in range(self.height)
+        ]
+
+
+@dataclass
+class ChunkedGrid:
+    """
+    Unbounded grid of small integers, addressed by signed positions.
+
+    Cells are stored in square chunks of 2 ** chunk_bits cells a side, each a flat array allocated
+    on the first write to one of its cells: memory grows with the area touched. Cells never
+    written hold fill. Searches on a chunked grid only end if the area they can reach is closed,
+    by walls or by fill cells they are not allowed through.
+    """
+    fill: int = 0
+    # array type code, signed bytes by default
+    typecode: str = 'b'
+    chunk_bits: int = 4
+    chunks: Dict[Tuple[int, int], array] = field(default_factory=dict, repr=False)
+    # Corners of the smallest rectangle holding every cell written
+    top_left: Optional[Position] = None
+    bottom_right: Optional[Position] = None
+
+    def __getitem__(self, position: Position) -> int:
+        chunk = self.chunks.get((position.x >> self.chunk_bits, position.y >> self.chunk_bits))
+        if chunk is None:
+            return self.fill
+        return chunk[self._offset(position)]
+
+    def __setitem__(self, position: Position, value: int) -> None:
+        key = (position.x >> self.chunk_bits, position.y >> self.chunk_bits)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = array(self.typecode, [self.fill]) * (1 << (2 * self.chunk_bits))
+            self.chunks[key] = chunk
+        chunk[self._offset(position)] = value
+
+        if self.top_left is None:
+            self.top_left = self.bottom_right = position
+        elif not (
+            self.top_left.x <= position.x <= self.bottom_right.x and
+            self.top_left.y <= position.y <= self.bottom_right.y
+        ):
+            self.top_left = Position(
+                min(self.top_left.x, position.x), min(self.top_left.y, position.y)
+            )
+            self.bottom_right = Position(
+                max(self.bottom_right.x, position.x), max(self.bottom_right.y, position.y)
+            )
+
+    def _offset(self, position: Position) -> int:
+        mask = (1 << self.chunk_bits) - 1
+        return ((position.y & mask) << self.chunk_bits) | (position.x & mask)
+
+    def rows(self) -> List[List[int]]:
+        """ Cells of the rectangle holding every cell written, from top_left """
+        if self.top_left is None:
+            return []
+        return [
+            [self[Position(x, y)] for x in range(self.top_left.x, self.bottom_right.x + 1)]
+            for y in range(self.top_left.y, self.bottom_right.y + 1)
+        ]
+
+
+TileMap = Union[List[List[T]], Grid, ChunkedGrid]
+
+
+def tile_content(tile_map: TileMap, position: Position) -> T:
+    """ Tile at position, None out of a list map """
+    if isinstance(tile_map, (Grid, ChunkedGrid)):
+        return tile_map[position]
+
+    if not 0 <= position.y < len(tile_map) or not 0 <= position.x < len(tile_map[position.y]):
         return None
 
     return tile_map[position.y][position.x]
 
 
-def shortest_path(
-    tile_map: List[List[T]], from_position: Position, to_position: Position,
-    authorized_tile_predicate: Callable[[Position], bool] = None
-) -> Optional[Path]:
-
-    if authorized_tile_predicate is None:
-        authorized_tile_predicate = lambda x: True
-
-    next_to_try = [(from_position, [])]
-    seen = set([from_position])
-    while True:
-        tile_pos, cur_path = next_to_try.pop(0)
-        if tile_pos == to_position:
-            return cur_path + [tile_pos]
-
-        next_tiles = [
-            tile for tile in neighbors(tile_pos)
-            if authorized_tile_predicate(tile)
+def walkable_neighbors(
+    tile_map: TileMap, unauthorized_tile_values: Set[T],
+    authorized_tile_predicate: Optional[Callable[[Position], bool]] = None,
+) -> Callable[[Position], List[Position]]:
+    """ Neighbors of a position a search can move to, out of a list map never being one """
+    # Like the outside of a grid
+    blocked_tiles = set(unauthorized_tile_values) | {None}
+
+    def next_positions(position: Position) -> List[Position]:
+        return [
+            tile for tile in neighbors(position)
+            if (authorized_tile_predicate is None or authorized_tile_predicate(tile)) and
+            tile_content(tile_map, tile) not in blocked_tiles
         ]
-        next_to_try.extend(
-            list(map(
-                lambda x: (x, cur_path + [x]),
-                [tile for tile in next_tiles if tile not in seen]
-            ))
-        )
-        seen = seen | set(next_tiles)
 
-        if not next_to_try:
+    return next_positions
+
+
+def bfs(
+    from_position: Position,
+    next_positions: Callable[[Position], Iterable[Position]],
+    is_target: Optional[Callable[[Position], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Tuple[Optional[Position], Dict[Position, Optional[Position]]]:
+    """
+    Breadth first search from from_position, till a position matching is_target.
+
+    Returns that position, None if there is none, along with the parent of every position
+    reached so far. The parents map doubles as the set of visited positions, in the order they
+    were reached.
+    """
+    parents: Dict[Position, Optional[Position]] = {from_position: None}
+    queue = deque([from_position])
+    found = None
+    expanded = 0
+    while queue:
+        position = queue.popleft()
+        expanded += 1
+        if is_target is not None and is_target(position):
+            found = position
+            break
+
+        for next_position in next_positions(position):
+            if next_position not in parents:
+                parents[next_position] = position
+                queue.append(next_position)
+
+    if stats is not None:
+        stats.expanded += expanded
+    return found, parents
+
+
+def astar(
+    from_position: Position,
+    to_position: Position,
+    next_positions: Callable[[Position], Iterable[Position]],
+    heuristic: Callable[[Position], int],
+    stats: Optional[SearchStats] = None,
+) -> Tuple[Optional[Position], Dict[Position, Optional[Position]]]:
+    """
+    A* search from from_position to to_position, every move costing 1.
+
+    heuristic must never overestimate the distance left, nor drop by more than 1 on a move, for
+    the path found to be a shortest one. On cost ties, the deepest position is expanded first.
+    Returns to_position, None if it cannot be reached, along with the parents map, as bfs does.
+    """
+    parents: Dict[Position, Optional[Position]] = {from_position: None}
+    costs: Dict[Position, int] = {from_position: 0}
+    # (estimated total cost, -cost so far, insertion order, position)
+    heap = [(heuristic(from_position), 0, 0, from_position)]
+    pushed = 1
+    found = None
+    expanded = 0
+    while heap:
+        _, neg_cost, _, position = heappop(heap)
+        cost = -neg_cost
+        if cost > costs[position]:
+            # Reached again through a shorter path since it was pushed
+            continue
+
+        expanded += 1
+        if position == to_position:
+            found = position
+            break
+
+        next_cost = cost + 1
+        for next_position in next_positions(position):
+            if next_cost < costs.get(next_position, next_cost + 1):
+                costs[next_position] = next_cost
+                parents[next_position] = position
+                heappush(
+                    heap,
+                    (next_cost + heuristic(next_position), -next_cost, pushed, next_position)
+                )
+                pushed += 1
+
+    if stats is not None:
+        stats.expanded += expanded
+    return found, parents
+
+
+def bidirectional_bfs(
+    from_position: Position,
+    to_position: Position,
+    next_positions: Callable[[Position], Iterable[Position]],
+    stats: Optional[SearchStats] = None,
+) -> Optional[List[Position]]:
+    """
+    Breadth first searches from both ends at once, till they meet.
+
+    Each turn, the side with the smaller frontier grows by one full level. Moves must be
+    reversible, since next_positions serves both ways.
+    Returns the path from from_position to to_position, the start excluded, as path_to does, None
+    if there is none.
+    """
+    if from_position == to_position:
+        return []
+
+    parents: Tuple[Dict[Position, Optional[Position]], ...] = (
+        {from_position: None}, {to_position: None}
+    )
+    depths: Tuple[Dict[Position, int], ...] = ({from_position: 0}, {to_position: 0})
+    frontiers = ([from_position], [to_position])
+    expanded = 0
+    meeting = None
+    while meeting is None and frontiers[0] and frontiers[1]:
+        # The forward side goes first on ties, so that its first level is known before the
+        # backward side gets to it: from_position itself may not be allowed to move into
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        visited, depth = parents[side], depths[side]
+        other_depth = depths[1 - side]
+        next_frontier = []
+        best_length = None
+        for position in frontiers[side]:
+            expanded += 1
+            next_depth = depth[position] + 1
+            for next_position in next_positions(position):
+                if next_position in visited:
+                    continue
+                visited[next_position] = position
+                depth[next_position] = next_depth
+                next_frontier.append(next_position)
+                if next_position in other_depth:
+                    # Keep scanning the level: another meeting may end closer to the other side
+                    length = next_depth + other_depth[next_position]
+                    if best_length is None or length < best_length:
+                        meeting, best_length = next_position, length
+
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+
+    if stats is not None:
+        stats.expanded += expanded
+    if meeting is None:
+        return None
+
+    path = path_to(parents[0], meeting)
+    position = meeting
+    while parents[1][position] is not None:
+        position = parents[1][position]
+        path.append(position)
+
+    return path
+
+
+def path_to(parents: Dict[Position, Optional[Position]], position: Position) -> List[Position]:
+    """ Path from the start of the search to position, the start excluded """
+    path = []
+    while parents[position] is not None:
+        path.append(position)
+        position = parents[position]
+    path.reverse()
+
+    return path
+
+
+def grid_bfs(
+    grid: Grid,
+    from_index: int,
+    unauthorized_values: Set[int],
+    target_value: Optional[int] = None,
+    target_index: Optional[int] = None,
+    authorized_index_predicate: Optional[Callable[[int], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Tuple[Optional[int], array]:
+    """
+    bfs on the cell indices of a grid, till the target_index cell or a cell holding target_value.
+
+    Returns the index of that cell, None if there is none, along with the parent index of every
+    cell, -1 for the cells not reached. The outside cells are never entered.
+    """
+    cells = grid.cells
+    unauthorized = set(unauthorized_values) | {grid.outside}
+    offsets = grid.neighbor_offsets
+    parents = array('q', [-1]) * len(cells)
+    parents[from_index] = from_index
+    queue = deque([from_index])
+    found = None
+    expanded = 0
+    while queue:
+        index = queue.popleft()
+        expanded += 1
+        if index == target_index or cells[index] == target_value:
+            found = index
+            break
+
+        for offset in offsets:
+            next_index = index + offset
+            if (
+                parents[next_index] < 0 and cells[next_index] not in unauthorized and
+                (authorized_index_predicate is None or authorized_index_predicate(next_index))
+            ):
+                parents[next_index] = index
+                queue.append(next_index)
+
+    if stats is not None:
+        stats.expanded += expanded
+    return found, parents
+
+
+def grid_path_to(grid: Grid, parents: array, index: int) -> List[Position]:
+    """ Path from the start of a grid_bfs to the cell at index, the start excluded """
+    path = []
+    while parents[index] != index:
+        path.append(grid.position(index))
+        index = parents[index]
+    path.reverse()
+
+    return path
+
+
+def shortest_path(
+    tile_map: TileMap, from_position: Position, to_position: Position,
+    authorized_tile_predicate: Callable[[Position], bool] = None,
+    unauthorized_tile_values: Optional[Set[T]] = None,
+    strategy: SearchStrategy = SearchStrategy.BFS,
+    stats: Optional[SearchStats] = None,
+) -> Optional[List[Position]]:
+    """
+    Shortest path between two positions, the start excluded, None if there is none.
+
+    All strategies find a path of the same length, not always the same path.
+    """
+    if isinstance(tile_map, Grid):
+        grid = tile_map
+        authorized_index_predicate = None
+        if authorized_tile_predicate is not None:
+            authorized_index_predicate = lambda index: authorized_tile_predicate(
+                grid.position(index)
+            )
+
+        if strategy == SearchStrategy.BFS:
+            found, parents = grid_bfs(
+                grid,
+                grid.index(from_position),
+                unauthorized_tile_values or set(),
+                target_index=grid.index(to_position),
+                authorized_index_predicate=authorized_index_predicate,
+                stats=stats,
+            )
+            if found is None:
+                return None
+            return grid_path_to(grid, parents, found)
+
+        cells = grid.cells
+        offsets = grid.neighbor_offsets
+        unauthorized = set(unauthorized_tile_values or ()) | {grid.outside}
+        start, end = grid.index(from_position), grid.index(to_position)
+        end_y, end_x = divmod(end, grid.stride)
+
+        def is_authorized(index: int) -> bool:
+            return cells[index] not in unauthorized and (
+                authorized_index_predicate is None or authorized_index_predicate(index)
+            )
+
+        def next_nodes(index: int) -> List[int]:
+            return [index + offset for offset in offsets if is_authorized(index + offset)]
+
+        def heuristic(index: int) -> int:
+            y, x = divmod(index, grid.stride)
+            return abs(x - end_x) + abs(y - end_y)
+
+        to_tile = grid.position
+
+    else:
+        start, end = from_position, to_position
+
+        def is_authorized(position: Position) -> bool:
+            if authorized_tile_predicate is not None and not authorized_tile_predicate(position):
+                return False
+            if not unauthorized_tile_values:
+                return True
+            # Like the outside of a grid, out of the map is never entered
+            tile = tile_content(tile_map, position)
+            return tile is not None and tile not in unauthorized_tile_values
+
+        def next_nodes(position: Position) -> List[Position]:
+            return [tile for tile in neighbors(position) if is_authorized(tile)]
+
+        def heuristic(position: Position) -> int:
+            return abs(position.x - to_position.x) + abs(position.y - to_position.y)
+
+        to_tile = lambda position: position
+
+    if strategy == SearchStrategy.BIDIRECTIONAL:
+        # The other searches only reach the end by moving into it
+        if start != end and not is_authorized(end):
             return None
+        path = bidirectional_bfs(start, end, next_nodes, stats)
+    else:
+        if strategy == SearchStrategy.ASTAR:
+            found, parents = astar(start, end, next_nodes, heuristic, stats)
+        else:
+            found, parents = bfs(start, next_nodes, lambda node: node == end, stats)
+        path = None if found is None else path_to(parents, found)
+
+    if path is None:
+        return None
+    return [to_tile(node) for node in path]
+
 
 def closest_tile(
-    tile_map: List[List[T]], from_position: Position, tile_value: T,
+    tile_map: TileMap, from_position: Position, tile_value: T,
     unauthorized_tile_values: Optional[Set[T]] = None
-) -> Optional[Tuple[Position, Path]]:
+) -> Optional[Tuple[Position, List[Position]]]:
 
     if unauthorized_tile_values is None:
         unauthorized_tile_values = set()
 
-    next_to_try = [(from_position, [])]
-    seen = set([from_position])
-    while True:
-        tile_pos, cur_path = next_to_try.pop(0)
-        next_tiles = [
-            tile for tile in neighbors(tile_pos)
-            if tile_content(tile_map, tile) not in unauthorized_tile_values
-        ]
-        next_to_try.extend(
-            list(map(
-                lambda x: (x, cur_path + [x]),
-                [tile for tile in next_tiles if tile not in seen]
-            ))
+    if isinstance(tile_map, Grid):
+        found, parents = grid_bfs(
+            tile_map, tile_map.index(from_position), unauthorized_tile_values, tile_value
         )
-        seen = seen | set(next_tiles)
-        if tile_content(tile_map, tile_pos) == tile_value:
-            return (tile_pos, cur_path)
-
-        if not next_to_try:
+        if found is None:
             return None
+        return (tile_map.position(found), grid_path_to(tile_map, parents, found))
+
+    found, parents = bfs(
+        from_position,
+        walkable_neighbors(tile_map, unauthorized_tile_values),
+        lambda position: tile_content(tile_map, position) == tile_value,
+    )
+    if found is None:
+        return None
+
+    return (found, path_to(parents, found))
 
 
 def max_distance(
-    tile_map: List[List[T]], from_position: Position,
+    tile_map: TileMap, from_position: Position,
     unauthorized_tile_values: Optional[Set[T]] = None
-) -> Dict[int, List[Position]]:
+) -> Dict[int, Set[Position]]:
 
     if unauthorized_tile_values is None:
         unauthorized_tile_values = set()
 
-    tiles_per_distance = {0: {from_position}}
-    seen = {from_position}
-
-    while True:
-        max_dist = max(list(tiles_per_distance.keys()))
-        next_tiles = set()
-        for tile in tiles_per_distance[max_dist]:
-            tile_neighbors = neighbors(tile)
-            next_tiles = next_tiles | set(
-                [
-                    t for t in tile_neighbors
-                    if t not in seen
-                    and t.x < len(tile_map) and t.y < len(tile_map) and t.x >= 0 and t.y >= 0
-                    and tile_content(tile_map, t) not in unauthorized_tile_values
-                ]
-            )
-            seen = seen | set(next_tiles)
+    if isinstance(tile_map, Grid):
+        return grid_max_distance(tile_map, from_position, unauthorized_tile_values)
 
-        if not next_tiles:
-            break
+    _, parents = bfs(from_position, walkable_neighbors(tile_map, unauthorized_tile_values))
+
+    # Positions are reached in order of distance, each one after its parent
+    distances: Dict[Position, int] = {}
+    tiles_per_distance: Dict[int, Set[Position]] = {}
+    for position, parent in parents.items():
+        distance = 0 if parent is None else distances[parent] + 1
+        distances[position] = distance
+        tiles_per_distance.setdefault(distance, set()).add(position)
+
+    return tiles_per_distance
+
+
+def grid_max_distance(
+    grid: Grid, from_position: Position, unauthorized_values: Set[int]
+) -> Dict[int, Set[Position]]:
+    """ max_distance on a grid, the distances array doubling as the visited marks """
+    cells = grid.cells
+    unauthorized = set(unauthorized_values) | {grid.outside}
+    offsets = grid.neighbor_offsets
+    distances = array('q', [-1]) * len(cells)
+    from_index = grid.index(from_position)
+    distances[from_index] = 0
+    queue = deque([from_index])
+    tiles_per_distance: Dict[int, Set[Position]] = {}
+    while queue:
+        index = queue.popleft()
+        distance = distances[index]
+        tiles_per_distance.setdefault(distance, set()).add(grid.position(index))
 
-        tiles_per_distance[max_dist + 1] = next_tiles
+        for offset in offsets:
+            next_index = index + offset
+            if distances[next_index] < 0 and cells[next_index] not in unauthorized:
+                distances[next_index] = distance + 1
+                queue.append(next_index)
 
     return tiles_per_distance
 
 
+@dataclass
+class FrontierExplorer:
+    """
+    Depth first exploration of the unknown cells of a grid, one move at a time.
+
+    The explorer keeps the way back to the start as a stack of open cells. The next move goes to
+    an unknown neighbour of the cell on top, the frontier, or back one cell once there is none.
+    Each choice is a look at four neighbours, and the whole exploration takes a number of moves
+    linear in the size of the explored area.
+    The explorer writes the revealed values to the grid.
+    """
+    grid: Union[Grid, ChunkedGrid]
+    unknown: int
+    blocked: Set[int]
+    start: Position
+    # Cell indices on a Grid, positions on a ChunkedGrid
+    stack: List[Union[int, Position]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.blocked = set(self.blocked)
+        if isinstance(self.grid, Grid):
+            self.blocked.add(self.grid.outside)
+            self.stack = [self.grid.index(self.start)]
+        else:
+            self.stack = [self.start]
+
+    def next_step(self) -> Optional[Position]:
+        """ Neighbour to move to from the top of the stack, None once everything is explored """
+        if not self.stack:
+            return None
+
+        if isinstance(self.grid, Grid):
+            index = self.stack[-1]
+            cells = self.grid.cells
+            for offset in self.grid.neighbor_offsets:
+                if cells[index + offset] == self.unknown:
+                    return self.grid.position(index + offset)
+        else:
+            for next_position in neighbors(self.stack[-1]):
+                if self.grid[next_position] == self.unknown:
+                    return next_position
+
+        self.stack.pop()
+        if not self.stack:
+            return None
+        if isinstance(self.grid, Grid):
+            return self.grid.position(self.stack[-1])
+        return self.stack[-1]
+
+    def reveal(self, position: Position, value: int) -> None:
+        """ Set the value of a cell. A newly found open cell is taken as moved into """
+        newly_found = self.grid[position] == self.unknown
+        self.grid[position] = value
+        if newly_found and value != self.unknown and value not in self.blocked:
+            if isinstance(self.grid, Grid):
+                self.stack.append(self.grid.index(position))
+            else:
+                self.stack.append(position)
+
+
+def distance_field(
+    tile_map: TileMap, from_position: Position, targets: Iterable[Position],
+    authorized_tile_predicate: Callable[[Position], bool] = None,
+    unauthorized_tile_values: Optional[Set[T]] = None,
+    gates: Optional[Dict[Position, int]] = None,
+    through_targets: bool = True,
+) -> Dict[Position, Tuple[int, int]]:
+    """
+    Distance from from_position to every reachable target, in a single bfs.
+
+    gates gives a bitmask to some positions. Each target comes with the union of the bitmasks of
+    the gates on its path, the target included. Gates are walked through like any other tile.
+    Without through_targets, targets are not: only the targets reached without crossing another
+    one are returned.
+    """
+    targets = set(targets)
+    if gates is None:
+        gates = {}
+
+    if isinstance(tile_map, Grid):
+        grid = tile_map
+        authorized_index_predicate = None
+        if authorized_tile_predicate is not None:
+            authorized_index_predicate = lambda index: authorized_tile_predicate(
+                grid.position(index)
+            )
+        field_per_index = grid_distance_field(
+            grid,
+            grid.index(from_position),
+            {grid.index(target) for target in targets},
+            unauthorized_tile_values or set(),
+            {grid.index(position): mask for position, mask in gates.items()},
+            authorized_index_predicate,
+            through_targets,
+        )
+        return {grid.position(index): route for index, route in field_per_index.items()}
+
+    walkable = walkable_neighbors(
+        tile_map, unauthorized_tile_values or set(), authorized_tile_predicate
+    )
+
+    def next_positions(position: Position) -> List[Position]:
+        if not through_targets and position in targets and position != from_position:
+            return []
+        return walkable(position)
+
+    remaining = set(targets)
+
+    def all_reached(position: Position) -> bool:
+        remaining.discard(position)
+        return not remaining
+
+    _, parents = bfs(from_position, next_positions, all_reached)
+
+    # Parents come before their children in the map, so each route extends a known one
+    routes = {from_position: (0, gates.get(from_position, 0))}
+    for position, parent in parents.items():
+        if parent is not None:
+            distance, mask = routes[parent]
+            routes[position] = (distance + 1, mask | gates.get(position, 0))
+
+    return {target: routes[target] for target in targets if target in routes}
+
+
+def grid_distance_field(
+    grid: Grid,
+    from_index: int,
+    target_indices: Set[int],
+    unauthorized_values: Set[int],
+    gates: Dict[int, int],
+    authorized_index_predicate: Optional[Callable[[int], bool]] = None,
+    through_targets: bool = True,
+) -> Dict[int, Tuple[int, int]]:
+    """ distance_field on the cell indices of a grid, with the gates given by index """
+    cells = grid.cells
+    unauthorized = set(unauthorized_values) | {grid.outside}
+    offsets = grid.neighbor_offsets
+    distances = array('q', [-1]) * len(cells)
+    masks = [0] * len(cells)
+    distances[from_index] = 0
+    masks[from_index] = gates.get(from_index, 0)
+    queue = deque([from_index])
+    routes: Dict[int, Tuple[int, int]] = {}
+    while queue and len(routes) < len(target_indices):
+        index = queue.popleft()
+        if index in target_indices:
+            routes[index] = (distances[index], masks[index])
+            if not through_targets and index != from_index:
+                continue
+
+        distance = distances[index] + 1
+        mask = masks[index]
+        for offset in offsets:
+            next_index = index + offset
+            if (
+                distances[next_index] < 0 and cells[next_index] not in unauthorized and
+                (authorized_index_predicate is None or authorized_index_predicate(next_index))
+            ):
+                distances[next_index] = distance
+                masks[next_index] = mask | gates.get(next_index, 0)
+                queue.append(next_index)
+
+    return routes
+
+
+@dataclass
+class DistanceMatrix:
+    """
+    Distances between labelled points, as a graph for searches above the tile level.
+
+    distances and gates are row major, one row per source label: -1 marks a point that cannot be
+    reached, and gates holds the bitmask of the gates crossed on the way.
+    """
+    labels: List[T]
+    distances: array
+    gates: List[int]
+    label_indices: Dict[T, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.label_indices = {label: idx for idx, label in enumerate(self.labels)}
+
+    def _cell(self, source: T, target: T) -> int:
+        return self.label_indices[source] * len(self.labels) + self.label_indices[target]
+
+    def distance(self, source: T, target: T) -> Optional[int]:
+        distance = self.distances[self._cell(source, target)]
+        return distance if distance >= 0 else None
+
+    def gates_crossed(self, source: T, target: T) -> int:
+        return self.gates[self._cell(source, target)]
+
+    def routes(self, source: T) -> List[Tuple[T, int, int]]:
+        """ (target, distance, gates crossed) for every other point reachable from source """
+        row = self.label_indices[source] * len(self.labels)
+        return [
+            (target, self.distances[row + idx], self.gates[row + idx])
+            for idx, target in enumerate(self.labels)
+            if target != source and self.distances[row + idx] >= 0
+        ]
+
+
+def distance_matrix(
+    tile_map: TileMap, points: Dict[T, Position],
+    authorized_tile_predicate: Callable[[Position], bool] = None,
+    unauthorized_tile_values: Optional[Set[T]] = None,
+    gates: Optional[Dict[Position, int]] = None,
+    through_targets: bool = True,
+) -> DistanceMatrix:
+    """
+    Distances between all the labelled points, one distance_field per point.
+
+    Without through_targets, the matrix only links the points reached without crossing another.
+    """
+    labels = list(points)
+    distances = array('q', [-1]) * (len(labels) ** 2)
+    gates_crossed = [0] * (len(labels) ** 2)
+    for source_idx, source in enumerate(labels):
+        routes = distance_field(
+            tile_map, points[source], points.values(), authorized_tile_predicate,
+            unauthorized_tile_values, gates, through_targets
+        )
+        row = source_idx * len(labels)
+        for target_idx, target in enumerate(labels):
+            route = routes.get(points[target])
+            if route is not None:
+                distances[row + target_idx], gates_crossed[row + target_idx] = route
+
+    return DistanceMatrix(labels, distances, gates_crossed)
+
+
 def neighbors(position: Position) -> List[Position]:
     return [
         Position(position.x, position.y + 1),
@@ -0,0 +1,25 @@
+from day18 import Labyrinth, collect_keys
+
+
+def test_collect_keys_examples():
+    assert collect_keys(Labyrinth.process_map('#########\n#b.A.@.a#\n#########')) == 8
+    assert collect_keys(Labyrinth.process_map(
+        '########################\n'
+        '#f.D.E.e.C.b.A.@.a.B.c.#\n'
+        '######################.#\n'
+        '#d.....................#\n'
+        '########################'
+    )) == 86
+
+
+def test_collect_keys_around_a_locked_door():
+    # The shortest route to the key crosses its door, the open detour is the way to go
+    labyrinth = Labyrinth.process_map('#######\n#@.A.a#\n#.###.#\n#.....#\n#######')
+    assert collect_keys(labyrinth) == 8
+
+
+def test_collect_keys_split_entrance():
+    labyrinth = Labyrinth.process_map(
+        '#######\n#a.#Cd#\n##...##\n##.@.##\n##...##\n#cB#Ab#\n#######'
+    )
+    assert collect_keys(labyrinth.split_entrance()) == 8
@@ -0,0 +1,17 @@
+from intcode import Program, run_program
+import pytest
+
+# Jumps over a relative base instruction, never run, to output 42
+CODE_BEFORE_DATA = [1005, 10, 5, 109, 0, 104, 42, 99, 0, 0, 1]
+
+
+@pytest.mark.parametrize('engine', [{}, {'compiled': True}, {'fused': True}])
+def test_positional_program_with_data_after_code(engine):
+    program = Program(list(CODE_BEFORE_DATA), relative_mode=False, **engine)
+    assert run_program(program).outputs == [42]
+
+
+@pytest.mark.parametrize('engine', [{}, {'compiled': True}, {'fused': True}])
+def test_positional_program_running_relative_instruction(engine):
+    with pytest.raises(ValueError):
+        run_program(Program([109, 1, 99], relative_mode=False, **engine))
@@ -0,0 +1,56 @@
+from pathfinder import (
+    Grid, Position, SearchStrategy, closest_tile, distance_matrix, shortest_path, tile_content,
+)
+
+# 11x3 map: wider than it has rows, with a wall in the columns past the row count
+NON_SQUARE_MAP = [
+    list('...#.....#.'),
+    list('.#.#.###.#.'),
+    list('.#...#.....'),
+]
+
+
+def test_tile_content_out_of_non_square_map():
+    assert tile_content(NON_SQUARE_MAP, Position(9, 0)) == '#'
+    assert tile_content(NON_SQUARE_MAP, Position(10, 2)) == '.'
+    assert tile_content(NON_SQUARE_MAP, Position(11, 0)) is None
+    assert tile_content(NON_SQUARE_MAP, Position(0, 3)) is None
+    assert tile_content(NON_SQUARE_MAP, Position(-1, 0)) is None
+    assert tile_content(NON_SQUARE_MAP, Position(0, -1)) is None
+
+
+def test_shortest_path_on_non_square_map():
+    grid = Grid.from_rows(NON_SQUARE_MAP, encode=ord)
+    for strategy in SearchStrategy:
+        path = shortest_path(
+            NON_SQUARE_MAP, Position(0, 0), Position(10, 0), unauthorized_tile_values={'#'},
+            strategy=strategy,
+        )
+        assert len(path) == 18
+        assert all(NON_SQUARE_MAP[tile.y][tile.x] != '#' for tile in path)
+
+        grid_path = shortest_path(
+            grid, Position(0, 0), Position(10, 0), unauthorized_tile_values={ord('#')},
+            strategy=strategy,
+        )
+        assert len(grid_path) == 18
+
+
+def test_closest_tile_stays_on_map():
+    assert closest_tile(NON_SQUARE_MAP, Position(0, 0), 'X', {'#'}) is None
+
+
+def test_distance_matrix_not_through_targets():
+    tile_map = [list('#######'), list('#a.B.c#'), list('#######')]
+    points = {'a': Position(1, 1), 'B': Position(3, 1), 'c': Position(5, 1)}
+    grid = Grid.from_rows(tile_map, encode=ord)
+    for search_map, wall in [(tile_map, '#'), (grid, ord('#'))]:
+        through = distance_matrix(search_map, points, unauthorized_tile_values={wall})
+        assert through.distance('a', 'c') == 4
+
+        matrix = distance_matrix(
+            search_map, points, unauthorized_tile_values={wall}, through_targets=False
+        )
+        assert matrix.distance('a', 'B') == 2
+        assert matrix.distance('B', 'c') == 2
+        assert matrix.distance('a', 'c') is None